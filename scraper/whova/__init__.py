@@ -0,0 +1,4 @@
+"""Whova agenda scrapers shared by every conference profile (see conferences.py).
+
+Run the stages as modules from scraper/, e.g. `python -m whova.events --conf kdd2025`.
+"""
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""asyncio scraping core (playwright.async_api) for the Whova scrapers.
+
+The CLIs stay sync; `--engine async` runs these coroutines via asyncio.run so
+that many page loads can overlap on one event loop under one rate budget.
+"""
+import asyncio
+import dataclasses
+import random
+import time
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright
+from playwright.async_api import Error as PWError
+
+from .common import Backoff
+from .common import FrameCache
+from .common import HarArchive
+from .common import RateLimiter
+from .common import ResourceBlocker
+from .common import ResponseCache
+from .common import WHOVA_EVENT_TOKEN
+from .events import BATCH_EXTRACT_JS
+from .events import CARD_RECORD_JS
+from .events import DEFAULT_SELECTORS
+from .events import Event
+from .events import SESSIONS_OBSERVER_JS
+from .events import SESSIONS_PROBE_JS
+from .events import SESSIONS_READY_JS
+from .events import Selectors
+from .events import event_from_record
+from .events import event_key
+from .events import nrm
+from .subsessions import LAZY_LOAD_JS
+from .subsessions import SUBS_SEL
+from .subsessions import SubEvent
+from .subsessions import extract_subsessions_html
+
+
+# ---------- Async rate limiter & Backoff ----------
+class AsyncRateLimiter(RateLimiter):
+    """Same token buckets as RateLimiter; waiting yields to the event loop."""
+
+    async def wait(self, url: Optional[str] = None):
+        delay = self.reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncBackoff(Backoff):
+    async def sleep(self, note=""):
+        await asyncio.sleep(self.next_delay(note))
+
+
+def _context_kwargs(ua: Optional[str], proxy: Optional[str]) -> dict:
+    kw = dict(
+        user_agent=ua,
+        viewport={"width": random.choice([1366, 1440, 1600]), "height": random.choice([900, 1000, 1050])},
+        extra_http_headers={"Accept-Language": random.choice(["en-US,en;q=0.9", "en-GB,en;q=0.9"])},
+    )
+    if proxy:
+        kw["proxy"] = {"server": proxy}
+    return kw
+
+
+# ---------- Whova helpers (async mirrors of events.py) ----------
+async def get_whova_frame_or_open_direct(page, first_timeout_ms=30000):
+    if WHOVA_EVENT_TOKEN.search(page.url or ""):
+        return page.main_frame, False
+    deadline = time.time() + first_timeout_ms / 1000.0
+    target_frame = None
+    while time.time() < deadline:
+        loc = page.locator("iframe[src*='whova']")
+        if await loc.count() > 0:
+            try:
+                target_frame = await (await loc.first.element_handle()).content_frame()
+            except Exception:
+                target_frame = None
+            break
+        await page.wait_for_timeout(500)
+
+    if target_frame is not None:
+        try:
+            if await target_frame.locator("div.session").count() > 0:
+                return target_frame, False
+        except Exception:
+            pass
+
+    try:
+        src = await page.locator("iframe[src*='whova']").first.get_attribute("src", timeout=5000)
+    except Exception:
+        src = None
+    if src:
+        await page.goto(src, wait_until="domcontentloaded", timeout=60000)
+        return page.main_frame, True
+    return page.main_frame, False
+
+
+async def resolve_whova_frame(page, hit: Optional[dict], first_timeout_ms=30000):
+    if hit and hit["direct"]:
+        return page.main_frame, True, True
+    if hit:
+        try:
+            el = await page.wait_for_selector("iframe[src*='whova']", state="attached", timeout=first_timeout_ms)
+            fr = await el.content_frame() if el else None
+            if fr is not None:
+                return fr, False, True
+        except PWError:
+            pass
+        print("[WARN] cached frame strategy failed; rediscovering", flush=True)
+    fr, opened_direct = await get_whova_frame_or_open_direct(page, first_timeout_ms=first_timeout_ms)
+    return fr, opened_direct, False
+
+
+async def wait_sessions_with_watchdog(frame, page, min_cnt=5, overall_ms=60000, rate: Optional[AsyncRateLimiter] = None):
+    start = time.time()
+    last = -1
+    while (time.time() - start) * 1000 < overall_ms:
+        try:
+            cnt = await frame.evaluate(SESSIONS_PROBE_JS)
+        except Exception:
+            cnt = 0
+        if cnt < 0:
+            await page.wait_for_timeout(800)
+            continue
+        if cnt != last:
+            print(f"[LOG]  session count={cnt}", flush=True)
+            last = cnt
+        if cnt >= min_cnt:
+            return cnt
+
+        try:
+            await frame.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        except Exception:
+            pass
+        if rate:
+            await rate.wait(frame.url)
+        else:
+            await page.wait_for_timeout(700)
+    return last if last >= 0 else 0
+
+
+async def wait_sessions_ready(frame, min_cnt=5, settle_ms=1200, overall_ms=60000) -> int:
+    t0 = time.time()
+    try:
+        await frame.evaluate(SESSIONS_OBSERVER_JS)
+        h = await frame.wait_for_function(SESSIONS_READY_JS, arg=[min_cnt, settle_ms], polling="raf", timeout=overall_ms)
+        cnt = int(await h.json_value())
+    except PWError:
+        try:
+            cnt = await frame.evaluate("window.__whovaReady ? window.__whovaReady.count : document.querySelectorAll('div.session').length")
+        except PWError:
+            cnt = 0
+    print(f"[TIME] sessions ready count={cnt} in {time.time() - t0:.2f}s", flush=True)
+    return cnt
+
+
+async def session_link_by_click(frame, session_nth) -> str:
+    url = ""
+    try:
+        clickable = frame.locator("div.session").nth(session_nth).locator("span.session-subs, .session-subs").first
+        if await clickable.count() > 0:
+            old = frame.url
+            async with frame.expect_navigation(timeout=6000):
+                await clickable.click(force=True)
+            url = frame.url or ""
+            if old:
+                try:
+                    await frame.goto(old, wait_until="domcontentloaded", timeout=15000)
+                except Exception:
+                    pass
+            if url and not urlparse(url).scheme:
+                url = ""
+    except Exception:
+        pass
+    return url
+
+
+async def extract_record_card(frame, session_nth, sel: Selectors = DEFAULT_SELECTORS) -> Optional[dict]:
+    """Record for one card after scrolling it into view, so lazily rendered
+    content is read (the async stand-in for extract_event_from_session)."""
+    s = frame.locator("div.session").nth(session_nth)
+    try:
+        await s.scroll_into_view_if_needed(timeout=1500)
+        await frame.page.wait_for_timeout(120)
+    except Exception:
+        pass
+    try:
+        return await s.evaluate(CARD_RECORD_JS, sel.js_args(), timeout=2000)
+    except PWError:
+        return None
+
+
+async def wait_subsessions_lazy(page, timeout_ms=35000, settle_ms=600) -> dict:
+    try:
+        return await page.evaluate(LAZY_LOAD_JS, [SUBS_SEL, settle_ms, timeout_ms])
+    except PWError:
+        return {"count": 0, "steps": 0, "ms": float(timeout_ms)}
+
+
+# ---------- Events ----------
+async def scrape_events(
+    url: str,
+    *,
+    rate: AsyncRateLimiter,
+    keep: Callable[[Event], None],
+    seen_keys,
+    checkpoint: Optional[Callable[[], None]] = None,
+    checkpoint_every: int = 50,
+    timeout_s: int = 180,
+    headless: bool = True,
+    uas: Optional[List[str]] = None,
+    proxies: Optional[List[str]] = None,
+    rotate_every: int = 60,
+    ready: str = "observer",
+    frame_cache: Optional[FrameCache] = None,
+    blocker: Optional[ResourceBlocker] = None,
+    selectors: Selectors = DEFAULT_SELECTORS,
+    cache: Optional[ResponseCache] = None,
+    har: Optional[HarArchive] = None,
+) -> int:
+    """Batch-extract the agenda, then click through the cards whose session link
+    the batch could not see, rotating UA/proxy every `rotate_every` live clicks.
+
+    Every event goes to keep() (the caller dedupes and checkpoints it) and
+    checkpoint() runs every `checkpoint_every` cards, as in the sync engine.
+    seen_keys: any container with `in` of event_key values (set or ResumeIndex).
+    Returns the number of cards seen.
+    """
+    uas = uas or [None]
+    proxies = proxies or [None]
+    rr = {"ua": 0, "proxy": 0}
+    backoff = AsyncBackoff()
+
+    async def new_context(browser):
+        ua = uas[rr["ua"] % len(uas)]
+        proxy = proxies[rr["proxy"] % len(proxies)]
+        rr["ua"] += 1
+        rr["proxy"] += 1
+        print(f"[CTX] new context | UA={(ua or '')[:30]}... | proxy={proxy or 'none'}", flush=True)
+        context = await browser.new_context(**_context_kwargs(ua, proxy))
+        if cache:
+            await cache.install_async(context)
+        if har:
+            await har.install_async(context)
+        if blocker:
+            await blocker.install_async(context)
+        return context, await context.new_page()
+
+    async def wait_ready(fr, page, min_cnt: int, overall_ms: int) -> int:
+        if ready == "observer":
+            return await wait_sessions_ready(fr, min_cnt=min_cnt, overall_ms=overall_ms)
+        return await wait_sessions_with_watchdog(fr, page, min_cnt=min_cnt, overall_ms=overall_ms, rate=rate)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        context, page = await new_context(browser)
+        try:
+            hit = frame_cache.get(url) if frame_cache else None
+            first_url = hit["embed_url"] if hit and hit["direct"] else url
+            print(f"[LOG] Open: {first_url} | frame cache={'hit' if hit else 'miss'}", flush=True)
+            t_req = time.time()
+            resp = await page.goto(first_url, wait_until="domcontentloaded", timeout=60_000)
+            rate.feedback(first_url, not (resp is not None and resp.status == 429), time.time() - t_req, reason="429")
+            await rate.wait(first_url)
+
+            fr, opened_direct, from_cache = await resolve_whova_frame(page, hit, first_timeout_ms=30_000)
+            print(f"[LOG] Use frame: {fr.url or '(main)'} | opened_direct={opened_direct} | cached={from_cache}", flush=True)
+            embed_url = fr.url if "whova" in (fr.url or "") else ""
+            if frame_cache and embed_url and not from_cache:
+                frame_cache.put(url, embed_url, opened_direct or fr == page.main_frame)
+            cnt = await wait_ready(fr, page, 5, min(timeout_s * 1000, 90_000))
+            print(f"[LOG] Final session count seen={cnt}", flush=True)
+            if cnt <= 0 and from_cache:
+                frame_cache.drop(url)
+            if cnt <= 0:
+                await backoff.sleep("[no sessions visible]")
+
+            try:
+                records = await fr.evaluate(BATCH_EXTRACT_JS, selectors.js_args()) or []
+            except PWError as e:
+                print(f"[WARN] batch extract failed: {e}", flush=True)
+                records = []
+            live = skipped = 0
+            for i, rec in enumerate(records):
+                ev, complete = event_from_record(rec, url)
+                if not complete and ev is not None and event_key(ev) in seen_keys:
+                    skipped += 1
+                elif not complete:
+                    live += 1
+                    if rotate_every > 0 and live > 1 and (live - 1) % rotate_every == 0:
+                        try:
+                            await context.close()
+                        except Exception:
+                            pass
+                        context, page = await new_context(browser)
+                        await page.goto(embed_url or url, wait_until="domcontentloaded", timeout=60_000)
+                        await rate.wait(embed_url or url)
+                        fr = page.main_frame if embed_url else (await get_whova_frame_or_open_direct(page, first_timeout_ms=15_000))[0]
+                        await wait_ready(fr, page, i + 1, 20_000)
+                    await rate.wait(fr.url)
+                    t_req = time.time()
+                    if not (ev and ev.title):
+                        # title not rendered yet: read the card again once it is in view
+                        again = await extract_record_card(fr, i, selectors)
+                        ev = (event_from_record(again, url)[0] if again else None) or ev
+                    link = ev.url if ev and ev.url else (await session_link_by_click(fr, i) if rec.get("has_subs") else "")
+                    rate.feedback(fr.url, bool(ev and ev.title or link), time.time() - t_req, reason="empty")
+                    if link:
+                        ev = dataclasses.replace(ev, url=link) if ev else Event(title="", time="", location="", tags=[], url=link)
+                if ev:
+                    keep(ev)
+                if checkpoint and checkpoint_every > 0 and (i + 1) % checkpoint_every == 0:
+                    checkpoint()
+            print(f"[LOG] async records={len(records)} | live={live} | skipped={skipped}", flush=True)
+            return len(records)
+        finally:
+            try:
+                await context.close()
+            except Exception:
+                pass
+            await browser.close()
+
+
+# ---------- Subsessions ----------
+async def scrape_subsessions(
+    jobs: List[Tuple[int, Dict[str, str]]],
+    url_col: str,
+    *,
+    rate: AsyncRateLimiter,
+    concurrency: int = 8,
+    headless: bool = True,
+    uas: Optional[List[str]] = None,
+    proxies: Optional[List[str]] = None,
+    rotate_every: int = 30,
+    parser: str = "lxml",
+    blocker: Optional[ResourceBlocker] = None,
+    cache: Optional[ResponseCache] = None,
+    har: Optional[HarArchive] = None,
+    on_result: Optional[Callable[[int, List[SubEvent]], Optional[Awaitable[None]]]] = None,
+) -> Dict[int, List[SubEvent]]:
+    """Crawl (index, parent_row) jobs with `concurrency` pages on one event loop."""
+    queue: "asyncio.Queue[Tuple[int, Dict[str, str]]]" = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+    done: Dict[int, List[SubEvent]] = {}
+    uas = uas or [None]
+    proxies = proxies or [None]
+    rr = {"ua": 0, "proxy": 0}
+
+    async def new_context(browser):
+        ua = uas[rr["ua"] % len(uas)]
+        proxy = proxies[rr["proxy"] % len(proxies)]
+        rr["ua"] += 1
+        rr["proxy"] += 1
+        context = await browser.new_context(**_context_kwargs(ua, proxy))
+        if cache:
+            await cache.install_async(context)
+        if har:
+            await har.install_async(context)
+        if blocker:
+            await blocker.install_async(context)
+        return context, await context.new_page()
+
+    async def worker(wid: int, browser):
+        backoff = AsyncBackoff()
+        context, page = await new_context(browser)
+        mine = 0
+        try:
+            while True:
+                try:
+                    idx, row = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                parent_url = nrm(row.get(url_col, ""))
+                if rotate_every > 0 and mine > 0 and mine % rotate_every == 0:
+                    await context.close()
+                    context, page = await new_context(browser)
+
+                print(f"[OPEN] a{wid} {idx + 1} {nrm(row.get('title', ''))[:60]}…", flush=True)
+                await rate.wait(parent_url)
+                t_req = time.time()
+                try:
+                    resp = await page.goto(parent_url, wait_until="domcontentloaded", timeout=60_000)
+                except PWError as e:
+                    print(f"[WARN] goto failed: {e}", flush=True)
+                    rate.feedback(parent_url, False, reason="error")
+                    await backoff.sleep("goto failed")
+                    continue
+                if resp is not None and resp.status == 429:
+                    rate.feedback(parent_url, False, reason="429")
+                await wait_subsessions_lazy(page, timeout_ms=35_000)
+                try:
+                    html = await page.content()
+                except Exception:
+                    html = ""
+                subs = extract_subsessions_html(html, base_url=parent_url, parser=parser)
+                if not subs:
+                    print(f"[WARN] subs not parsed: {parent_url}", flush=True)
+                    rate.feedback(parent_url, False, reason="empty")
+                else:
+                    rate.feedback(parent_url, True, time.time() - t_req)
+                rows = [
+                    SubEvent(
+                        parent_title=nrm(row.get("title", "") or row.get("Title", "")),
+                        parent_time=nrm(row.get("time", "") or row.get("Time", "")),
+                        parent_location=nrm(row.get("location", "") or row.get("Location", "")),
+                        parent_tags=nrm(row.get("tags", "") or row.get("Tags", "")),
+                        parent_url=parent_url,
+                        title=st,
+                        time=sti,
+                        location=sl,
+                        url=su,
+                    )
+                    for (st, sti, sl, su) in subs
+                ]
+                done[idx] = rows
+                mine += 1
+                if on_result:
+                    res = on_result(idx, rows)
+                    if asyncio.iscoroutine(res):
+                        await res
+        finally:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        try:
+            n = max(1, min(concurrency, len(jobs)))
+            print(f"[LOG] async workers={n}", flush=True)
+            await asyncio.gather(*(worker(w, browser) for w in range(n)))
+        finally:
+            await browser.close()
+    return done
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Reproducible benchmarks for the Whova scrapers against a recorded HAR fixture.
+
+  # once, against the live site (polite default rates):
+  python -m whova.bench record --conf kdd2025 --fixture bench_fixtures/kdd2025
+
+  # any number of times, fully offline (rate limiting is lifted on replay):
+  python -m whova.bench run --conf kdd2025 --fixture bench_fixtures/kdd2025 --repeat 3
+  python -m whova.bench micro --conf kdd2025 --fixture bench_fixtures/kdd2025 --n 30
+
+`run` times the events and subsessions CLIs end to end, each repeat in a fresh
+temp directory so that resume state never short-circuits a run. `micro` times
+extract_event_from_session against the batch extractor, and wait_subsessions_ready
+against the IntersectionObserver wait, on the same replayed pages.
+"""
+import argparse
+import contextlib
+import io
+import shlex
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import List
+
+from playwright.sync_api import sync_playwright
+
+from . import events as ev
+from . import subsessions as subs
+from .common import DEFAULT_BLOCK_DOMAINS
+from .common import DEFAULT_BLOCK_RESOURCES
+from .common import HarArchive
+from .common import ResourceBlocker
+from .conferences import load_conferences
+
+
+def _csv_rows(path: Path) -> int:
+    if not path.exists():
+        return 0
+    with path.open(encoding="utf-8") as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+def _timed(fn: Callable[[], None], quiet: bool, log: Path) -> float:
+    t0 = time.perf_counter()
+    if quiet:
+        with log.open("a", encoding="utf-8") as f, contextlib.redirect_stdout(f):
+            fn()
+    else:
+        fn()
+    return time.perf_counter() - t0
+
+
+def _stats(xs: List[float]) -> str:
+    if not xs:
+        return "-"
+    return f"min={min(xs):.2f}s median={statistics.median(xs):.2f}s mean={statistics.mean(xs):.2f}s (n={len(xs)})"
+
+
+def record(conf, fixture: Path, events_args: List[str], subs_args: List[str]):
+    fixture.mkdir(parents=True, exist_ok=True)
+    events_csv = fixture / "events.csv"
+    print(f"[BENCH] recording events -> {fixture / 'events'}", flush=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "events.csv"
+        ev.main(["--url", conf.url, "--out", str(out), "--frame-cache", "", "--har", str(fixture / "events"), "--har-mode", "record", *events_args])
+        shutil.copyfile(out, events_csv)
+        print(f"[BENCH] recording subsessions -> {fixture / 'subsessions'}", flush=True)
+        subs.main(["--in", str(events_csv), "--out", str(Path(tmp) / "subs.csv"), "--har", str(fixture / "subsessions"), "--har-mode", "record", *subs_args])
+    print(f"[BENCH] fixture ready: {fixture} ({_csv_rows(events_csv)} events)", flush=True)
+
+
+def run(conf, fixture: Path, repeat: int, quiet: bool, events_args: List[str], subs_args: List[str]):
+    times: Dict[str, List[float]] = {"events": [], "subsessions": []}
+    rows: Dict[str, int] = {}
+    for r in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            log = tmp / "run.log"
+            ev_out, sub_out = tmp / "events.csv", tmp / "subs.csv"
+            times["events"].append(
+                _timed(lambda: ev.main(["--url", conf.url, "--out", str(ev_out), "--frame-cache", "", "--har", str(fixture / "events"), *events_args]), quiet, log)
+            )
+            times["subsessions"].append(
+                _timed(lambda: subs.main(["--in", str(fixture / "events.csv"), "--out", str(sub_out), "--har", str(fixture / "subsessions"), *subs_args]), quiet, log)
+            )
+            rows = {"events": _csv_rows(ev_out), "subsessions": _csv_rows(sub_out)}
+            print(f"[BENCH] repeat {r + 1}/{repeat}: events {times['events'][-1]:.2f}s ({rows['events']} rows) | subsessions {times['subsessions'][-1]:.2f}s ({rows['subsessions']} rows)", flush=True)
+    for stage, xs in times.items():
+        print(f"[BENCH] {stage:<12} {_stats(xs)} | rows={rows.get(stage, 0)}", flush=True)
+    print(f"[BENCH] end-to-end   {_stats([a + b for a, b in zip(times['events'], times['subsessions'])])}", flush=True)
+
+
+def micro(conf, fixture: Path, n: int, headful: bool):
+    blocker = ResourceBlocker.from_args(DEFAULT_BLOCK_RESOURCES, DEFAULT_BLOCK_DOMAINS)
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=not headful)
+        try:
+            # agenda: per-card locator extraction vs one batch evaluate
+            context = browser.new_context()
+            HarArchive(fixture / "events").install(context)
+            blocker.install(context)
+            page = context.new_page()
+            page.goto(conf.url, wait_until="domcontentloaded", timeout=60_000)
+            fr, _ = ev.get_whova_frame_or_open_direct(page, first_timeout_ms=30_000)
+            cnt, dt = ev.wait_sessions_ready(fr, min_cnt=5, overall_ms=60_000)
+            print(f"[BENCH] agenda ready: {cnt} cards in {dt:.2f}s", flush=True)
+            sel = ev.Selectors.from_args(conf.title_selectors, conf.location_selector, conf.chip_selector)
+            k = min(n, cnt)
+            t0 = time.perf_counter()
+            for i in range(k):
+                ev.extract_event_from_session(fr, i, base_url=conf.url, sel=sel)
+            per_card = (time.perf_counter() - t0) / max(1, k)
+            t0 = time.perf_counter()
+            recs = ev.extract_records_batch(fr, sel)
+            batch = time.perf_counter() - t0
+            print(f"[BENCH] extract_event_from_session: {per_card * 1000:.1f} ms/card over {k} cards (~{per_card * cnt:.1f}s for all {cnt})", flush=True)
+            print(f"[BENCH] extract_records_batch:      {batch * 1000:.1f} ms for {len(recs)} cards", flush=True)
+            context.close()
+
+            # subsession pages: scroll loop vs IntersectionObserver wait
+            parents, url_col = subs.read_parent_events(fixture / "events.csv")
+            urls = [subs.nrm(r.get(url_col, "")) for r in parents if subs.WHOVA_SESSION.search(subs.nrm(r.get(url_col, "")))][:n]
+            waits: Dict[str, List[float]] = {"wait_subsessions_ready": [], "wait_subsessions_lazy": []}
+            for name, wait in (("wait_subsessions_ready", subs.wait_subsessions_ready), ("wait_subsessions_lazy", subs.wait_subsessions_lazy)):
+                context = browser.new_context()
+                HarArchive(fixture / "subsessions").install(context)
+                blocker.install(context)
+                page = context.new_page()
+                for u in urls:
+                    page.goto(u, wait_until="domcontentloaded", timeout=60_000)
+                    t0 = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        wait(page, timeout_ms=35_000)
+                    waits[name].append(time.perf_counter() - t0)
+                context.close()
+                print(f"[BENCH] {name:<23} {_stats(waits[name])}", flush=True)
+        finally:
+            browser.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["record", "run", "micro"])
+    ap.add_argument("--conf", default="kdd2025", help="conference profile (see conferences.py)")
+    ap.add_argument("--profiles", default="", help="JSON list of extra conference profiles")
+    ap.add_argument("--fixture", default="", help="fixture directory (default: bench_fixtures/<conf>)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--n", type=int, default=30, help="micro: cards / subsession pages to time")
+    ap.add_argument("--events-args", default="", help="extra flags for the events CLI, e.g. '--extract-mode html'")
+    ap.add_argument("--subs-args", default="", help="extra flags for the subsessions CLI, e.g. '--concurrency 4 --lazy scroll'")
+    ap.add_argument("--verbose", action="store_true", help="show the scrapers' own logs during `run`")
+    ap.add_argument("--headful", action="store_true")
+    args = ap.parse_args()
+
+    conf = load_conferences(Path(args.profiles) if args.profiles else None)[args.conf]
+    fixture = Path(args.fixture or Path("bench_fixtures") / conf.name)
+    events_args, subs_args = shlex.split(args.events_args), shlex.split(args.subs_args)
+    if args.headful:
+        events_args.append("--headful")
+        subs_args.append("--headful")
+    if args.cmd == "record":
+        record(conf, fixture, events_args, subs_args)
+    elif args.cmd == "run":
+        run(conf, fixture, args.repeat, not args.verbose, events_args, subs_args)
+    else:
+        micro(conf, fixture, args.n, args.headful)
+
+
+if __name__ == "__main__":
+    main()
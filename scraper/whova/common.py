@@ -0,0 +1,1232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Shared Playwright helpers for the Whova scrapers."""
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from urllib.parse import urlparse
+
+
+# ---------- Token-bucket rate limiter ----------
+def parse_host_rps(items: Optional[List[str]]) -> Dict[str, float]:
+    """['whova.com=0.4', 'kdd.org=1'] -> {'whova.com': 0.4, 'kdd.org': 1.0}"""
+    out: Dict[str, float] = {}
+    for it in items or []:
+        host, _, v = it.partition("=")
+        if host and v:
+            out[host.strip().lower()] = float(v)
+    return out
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(0.01, rate)
+        self.base_rate = self.rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self, now: float) -> float:
+        """Take one token (possibly going into debt); return seconds until it is valid."""
+        self._refill(now)
+        self.tokens -= 1.0
+        return max(0.0, -self.tokens / self.rate)
+
+    def try_take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class RateLimiter:
+    """Thread-safe token bucket with `burst` capacity and optional per-host budgets.
+
+    wait(url) picks the bucket whose host suffix matches url ('*' otherwise).
+    Jitter is only added when a caller actually had to wait, so requests under
+    budget go out immediately.
+
+    With adaptive=True each bucket runs AIMD on feedback(): +step per healthy
+    response (latency <= latency_target), x0.5 on timeouts/429/empty results,
+    bounded to [base/4, base] of the bucket's configured rate: the configured
+    rate is a ceiling, AIMD only backs off from it and recovers back to it.
+    """
+
+    def __init__(
+        self,
+        max_rps: float,
+        jitter_ms: Tuple[int, int],
+        burst: int = 1,
+        host_rps: Optional[Dict[str, float]] = None,
+        adaptive: bool = False,
+        latency_target: float = 5.0,
+    ):
+        self.adaptive = adaptive
+        self.latency_target = latency_target
+        self.last_reason = "static"
+        self.jmin, self.jmax = jitter_ms
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {"*": TokenBucket(max_rps, burst)}
+        for host, rps in (host_rps or {}).items():
+            self.buckets[host] = TokenBucket(rps, burst)
+        self.throttled_s = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _key(self, url: Optional[str]) -> str:
+        if url and len(self.buckets) > 1:
+            host = (urlparse(url).hostname or "").lower()
+            for k in self.buckets:
+                if k != "*" and (host == k or host.endswith("." + k)):
+                    return k
+        return "*"
+
+    def reserve(self, url: Optional[str] = None) -> float:
+        with self._lock:
+            delay = self.buckets[self._key(url)].reserve(time.monotonic())
+            if delay > 0 and self.jmax > 0:
+                delay += random.uniform(self.jmin / 1000.0, self.jmax / 1000.0)
+            self.calls += 1
+            self.throttled_s += delay
+            return delay
+
+    def wait(self, url: Optional[str] = None):
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def try_acquire(self, url: Optional[str] = None) -> bool:
+        """Non-blocking: take a token if one is available right now."""
+        with self._lock:
+            ok = self.buckets[self._key(url)].try_take(time.monotonic())
+            if ok:
+                self.calls += 1
+            return ok
+
+    def feedback(self, url: Optional[str], ok: bool, latency: Optional[float] = None, reason: str = ""):
+        """Report the outcome of a request made under this limiter (AIMD when adaptive)."""
+        if not self.adaptive:
+            return
+        with self._lock:
+            b = self.buckets[self._key(url)]
+            if not ok:
+                b.rate = max(b.base_rate / 4.0, b.rate * 0.5)
+                self.last_reason = reason or "error"
+            elif latency is not None and latency > self.latency_target:
+                self.last_reason = f"slow {latency:.1f}s"
+            else:
+                b.rate = min(b.base_rate, b.rate + b.base_rate * 0.05)
+                self.last_reason = "ok"
+
+    def state(self) -> str:
+        rates = ",".join(f"{k}={b.rate:.2f}" for k, b in self.buckets.items())
+        return f"rps[{rates}] ({self.last_reason})"
+
+    def summary(self) -> str:
+        return f"calls={self.calls} | throttled={self.throttled_s:.1f}s | {self.state()}"
+
+
+class Backoff:
+    """Exponential backoff with jitter; next_delay() is shared with the asyncio engine."""
+
+    def __init__(self, base=2.0, factor=2.0, cap=90.0):
+        self.base, self.factor, self.cap = base, factor, cap
+        self.n = 0
+
+    def reset(self):
+        self.n = 0
+
+    def next_delay(self, note="") -> float:
+        t = min(self.cap, self.base * (self.factor**self.n)) * random.uniform(0.85, 1.15)
+        self.n += 1
+        print(f"[BACKOFF] sleeping ~{t:.1f}s {note}", flush=True)
+        return t
+
+    def sleep(self, note=""):
+        time.sleep(self.next_delay(note))
+
+
+# ---------- Resource blocking ----------
+DEFAULT_BLOCK_RESOURCES = "image,font,media"
+DEFAULT_BLOCK_DOMAINS = ",".join(
+    [
+        "google-analytics.com",
+        "googletagmanager.com",
+        "doubleclick.net",
+        "facebook.net",
+        "connect.facebook.net",
+        "hotjar.com",
+        "segment.io",
+        "mixpanel.com",
+        "intercom.io",
+        "sentry.io",
+        "newrelic.com",
+        "nr-data.net",
+    ]
+)
+
+
+def split_csv_arg(s: str) -> List[str]:
+    return [x.strip().lower() for x in (s or "").split(",") if x.strip()]
+
+
+class ResourceBlocker:
+    """Route handler that aborts unneeded resource types and tracker domains.
+
+    Blocked requests never transfer, so their size is unknown; what is counted
+    is the number of blocked requests and the bytes of responses let through
+    (from Content-Length), which is what the block profile is tuned against.
+    """
+
+    def __init__(self, resource_types: Iterable[str], domains: Iterable[str]):
+        self.resource_types: Set[str] = set(resource_types)
+        self.domains: List[str] = list(domains)
+        self.blocked = Counter()
+        self.passed = 0
+        self.passed_bytes = 0
+
+    @classmethod
+    def from_args(cls, block_resources: str, block_domains: str) -> "ResourceBlocker":
+        return cls(split_csv_arg(block_resources), split_csv_arg(block_domains))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.resource_types or self.domains)
+
+    def _blocked_domain(self, url: str) -> bool:
+        host = (urlparse(url).hostname or "").lower()
+        return any(host == d or host.endswith("." + d) for d in self.domains)
+
+    def _handle(self, route):
+        req = route.request
+        if req.resource_type in self.resource_types:
+            self.blocked[req.resource_type] += 1
+            return route.abort()
+        if self.domains and self._blocked_domain(req.url):
+            self.blocked["domain"] += 1
+            return route.abort()
+        # async API: the returned coroutine is awaited by Playwright
+        return route.fallback()
+
+    def _on_response(self, response):
+        self.passed += 1
+        try:
+            self.passed_bytes += int(response.headers.get("content-length") or 0)
+        except ValueError:
+            pass
+
+    def install(self, context):
+        if not self.enabled:
+            return
+        context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    async def install_async(self, context):
+        if not self.enabled:
+            return
+        await context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    def summary(self) -> str:
+        kinds = ",".join(f"{k}={v}" for k, v in sorted(self.blocked.items())) or "-"
+        return f"blocked={sum(self.blocked.values())} ({kinds}) | passed={self.passed} (~{self.passed_bytes / 1024:.0f} KB)"
+
+
+# ---------- Browser reuse ----------
+class BrowserPool:
+    """Keeps one Chromium process alive across context rotations.
+
+    Rotation only creates a fresh BrowserContext, and the proxy is set per
+    context, so switching proxies never relaunches the browser.
+    """
+
+    def __init__(self, playwright, headless: bool = True):
+        self.playwright = playwright
+        self.headless = headless
+        self._browser = None
+        self.launches = 0
+        self.launch_s = 0.0
+        self.contexts = 0
+        self.context_s = 0.0
+
+    def browser(self):
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        self.close()
+        t0 = time.time()
+        self._browser = self.playwright.chromium.launch(headless=self.headless)
+        dt = time.time() - t0
+        self.launches += 1
+        self.launch_s += dt
+        print(f"[TIME] browser launch {dt:.2f}s", flush=True)
+        return self._browser
+
+    def new_context(self, proxy: Optional[str] = None, **kwargs):
+        browser = self.browser()
+        if proxy:
+            kwargs["proxy"] = {"server": proxy}
+        t0 = time.time()
+        context = browser.new_context(**kwargs)
+        dt = time.time() - t0
+        self.contexts += 1
+        self.context_s += dt
+        print(f"[TIME] new context {dt:.2f}s | proxy={proxy or 'none'}", flush=True)
+        return context
+
+    def close(self):
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+        self._browser = None
+
+    def summary(self) -> str:
+        return f"launches={self.launches} ({self.launch_s:.1f}s) | contexts={self.contexts} ({self.context_s:.1f}s)"
+
+
+def first_paint_ms(page) -> Optional[float]:
+    """first-contentful-paint (or first-paint) of the current document, in ms."""
+    try:
+        return page.evaluate(
+            """() => {
+              const e = performance.getEntriesByName('first-contentful-paint')[0]
+                     || performance.getEntriesByName('first-paint')[0];
+              return e ? e.startTime : null;
+            }"""
+        )
+    except Exception:
+        return None
+
+
+# ---------- Whova JSON/XHR capture ----------
+WHOVA_SESSION_ID = re.compile(r"/embedded/session/([^/]+)/(\d+)")
+WHOVA_EVENT_TOKEN = re.compile(r"whova\.com/embedded/(?:event|agenda|session)/([^/?#]+)")
+WHOVA_API_URL = re.compile(r"whova\.com/.*(?:api|agenda|session)", re.I)
+
+# payloadのキー揺れ吸収（最初に見つかったキーを採用）
+SESSION_KEYS = {
+    "id": ("id", "session_id", "sid"),
+    "title": ("name", "title", "session_name"),
+    # *_ts（epoch秒）は会場のタイムゾーンが分からず時刻表記に直せないので拾わない
+    "start": ("start_time", "starttime", "start"),
+    "end": ("end_time", "endtime", "end"),
+    "location": ("location", "place", "room", "venue"),
+    "tracks": ("tracks", "track", "tags", "categories"),
+    "url": ("url", "link", "website"),
+    "subs": ("sub_sessions", "subsessions", "children"),
+}
+CLOCK_PAT = re.compile(r"(?i)(?:T|\b)(\d{1,2}):(\d{2})(?::\d{2})?\s*(am|pm)?")
+
+
+def whova_session_id(url: str) -> str:
+    """Numeric Whova session id from an embedded/session URL ('' if absent)."""
+    m = WHOVA_SESSION_ID.search(url or "")
+    return m.group(2) if m else ""
+
+
+def clock_style(sample: str, default: str = "am") -> str:
+    """How the DOM renders clock times, read off one rendered time string:
+    '24h' ('05:30'), 'am' ('8:00 am') or 'AM' ('8:00 AM'); `default` if there is no time."""
+    m = CLOCK_PAT.search(sample or "")
+    if not m:
+        return default
+    if not m.group(3):
+        return "24h"
+    return "AM" if m.group(3).isupper() else "am"
+
+
+def fmt_clock(v, style: str = "am") -> str:
+    """'08:00', '8:00 AM' or an ISO datetime -> '8:00 am' (style 'am'), '8:00 AM' ('AM')
+    or '08:00' ('24h'), matching clock_style(); '' if not a clock time."""
+    if not isinstance(v, str):
+        return ""
+    m = CLOCK_PAT.search(v)
+    if not m:
+        return ""
+    h, mi, ap = int(m.group(1)), m.group(2), (m.group(3) or "").lower()
+    if ap:
+        h = h % 12 + (12 if ap == "pm" else 0)
+    if style == "24h":
+        return f"{h:02d}:{mi}"
+    ap = "pm" if h >= 12 else "am"
+    return f"{h % 12 or 12}:{mi} {ap.upper() if style == 'AM' else ap}"
+
+
+def _pick(d: dict, field: str):
+    for k in SESSION_KEYS[field]:
+        if k in d and d[k] not in (None, ""):
+            return d[k]
+    return None
+
+
+def _text(v) -> str:
+    if isinstance(v, dict):
+        v = _pick(v, "title") or ""
+    return re.sub(r"\s+", " ", str(v or "").strip())
+
+
+class WhovaCapture:
+    """Collects Whova JSON responses on a page and turns session-like objects into rows.
+
+    Bodies are read lazily in sessions(), not inside the response handler.
+    """
+
+    def __init__(self, url_pat=WHOVA_API_URL):
+        self.url_pat = url_pat
+        self.responses: List = []
+        self._parsed: List = []
+
+    def attach(self, page):
+        page.on("response", self._on_response)
+
+    def clear(self):
+        self.responses.clear()
+        self._parsed.clear()
+
+    def _on_response(self, response):
+        if not self.url_pat.search(response.url):
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+        self.responses.append(response)
+
+    def payloads(self) -> List:
+        while len(self._parsed) < len(self.responses):
+            resp = self.responses[len(self._parsed)]
+            try:
+                self._parsed.append(resp.json())
+            except Exception:
+                self._parsed.append(None)
+        return [x for x in self._parsed if x is not None]
+
+    def _normalize(self, d: dict, token: str, clock: str, is_sub: bool = False) -> Optional[dict]:
+        title = _text(_pick(d, "title"))
+        # session pages render 12h times in upper case where the agenda uses lower case
+        sub_clock = "AM" if clock == "am" else clock
+        start, end = fmt_clock(_pick(d, "start"), sub_clock if is_sub else clock), fmt_clock(_pick(d, "end"), sub_clock if is_sub else clock)
+        if not title or not start:
+            return None
+        sid = str(_pick(d, "id") or "")
+        tracks = _pick(d, "tracks") or []
+        if not isinstance(tracks, list):
+            tracks = [tracks]
+        subs_raw = _pick(d, "subs") or []
+        subs = [s for s in (self._normalize(x, token, clock, True) for x in subs_raw if isinstance(x, dict)) if s]
+        url = _text(_pick(d, "url"))
+        if not url and sid and token and (subs or is_sub):
+            url = f"https://whova.com/embedded/session/{token}/{sid}/?widget=primary"
+        return {
+            "id": sid,
+            "title": title,
+            "time": f"{start} – {end}" if end else start,
+            "location": _text(_pick(d, "location")),
+            "tags": [t for t in (_text(x) for x in tracks) if t],
+            "url": url,
+            "subs": subs,
+        }
+
+    def sessions(self, token: str = "", clock: str = "am") -> List[dict]:
+        """Top-level session-like objects in arrival order, deduplicated by id/title+time.
+
+        `clock` is the agenda's clock_style(); times come out as the DOM path writes them.
+        """
+        out: List[dict] = []
+        seen: Set = set()
+
+        def walk(obj):
+            if isinstance(obj, dict):
+                s = self._normalize(obj, token, clock)
+                if s:
+                    key = s["id"] or (s["title"].lower(), s["time"].lower())
+                    if key not in seen:
+                        seen.add(key)
+                        out.append(s)
+                    return
+                for v in obj.values():
+                    walk(v)
+            elif isinstance(obj, list):
+                for v in obj:
+                    walk(v)
+
+        for payload in self.payloads():
+            walk(payload)
+        return out
+
+    def wait(self, page, settle_ms: int = 1500, overall_ms: int = 15000, first_ms: int = 5000) -> int:
+        """Wait until no new JSON response has arrived for settle_ms; give up after
+        first_ms when none has arrived at all (the page does not load its data as JSON)."""
+        start = time.time()
+        last_n, last_t = -1, time.time()
+        while (time.time() - start) * 1000 < overall_ms:
+            n = len(self.responses)
+            if n != last_n:
+                last_n, last_t = n, time.time()
+            elif n > 0 and (time.time() - last_t) * 1000 >= settle_ms:
+                break
+            elif n == 0 and (time.time() - start) * 1000 >= first_ms:
+                break
+            page.wait_for_timeout(250)
+        return len(self.responses)
+
+    def subsessions_for(self, parent_url: str, clock: str = "am") -> List[dict]:
+        """Subsession rows for the session in parent_url, if a captured payload has them.
+
+        `clock` is the agenda's clock_style() (e.g. of the parent row's time).
+        """
+        pid = whova_session_id(parent_url)
+        m = WHOVA_EVENT_TOKEN.search(parent_url or "")
+        for s in self.sessions(m.group(1) if m else "", clock):
+            if s["id"] == pid and s["subs"]:
+                return s["subs"]
+        return []
+
+
+# ---------- On-disk response cache ----------
+# request headers that select a different representation; UA and Accept-Language
+# are left out on purpose because they rotate per context and would defeat the cache
+CACHE_KEY_HEADERS = ("accept",)
+CACHE_RESOURCE_TYPES = {"document", "xhr", "fetch", "script", "stylesheet"}
+# the stored body is already decoded, so these no longer describe it
+_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class ResponseCache:
+    """Content-addressed response store under `root` with TTL, a size cap and LRU eviction.
+
+    Bodies live in blobs/<sha1 of body> (identical bodies are stored once); an
+    SQLite index maps sha1(method, URL, CACHE_KEY_HEADERS) to status, headers,
+    blob and timestamps. Only 200 GET responses are stored. In offline mode
+    entries never expire and misses are not fetched: the Playwright route
+    aborts them and get() returns None.
+    """
+
+    def __init__(self, root: Path, ttl_s: float = 86400.0, max_bytes: int = 512 * 1024 * 1024, offline: bool = False):
+        import sqlite3
+
+        self.root = Path(root)
+        (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._db = sqlite3.connect(str(self.root / "index.sqlite"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT,"
+            " blob TEXT, size INTEGER, stored REAL, used REAL)"
+        )
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    @staticmethod
+    def key(url: str, headers: Optional[Dict[str, str]] = None, method: str = "GET") -> str:
+        h = {k.lower(): v for k, v in (headers or {}).items()}
+        parts = [method.upper(), url] + [f"{k}={h.get(k, '')}" for k in CACHE_KEY_HEADERS]
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, method: str = "GET") -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        k = self.key(url, headers, method)
+        with self._lock:
+            r = self._db.execute("SELECT status, headers, blob, stored FROM entries WHERE key = ?", (k,)).fetchone()
+            if r is None or (not self.offline and time.time() - r[3] > self.ttl_s):
+                self.stats["miss"] += 1
+                return None
+            try:
+                body = (self.root / "blobs" / r[2]).read_bytes()
+            except OSError:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (k,))
+                self.stats["miss"] += 1
+                return None
+            self._db.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), k))
+            self.stats["hit"] += 1
+        return r[0], json.loads(r[1]), body
+
+    def put(self, url: str, req_headers: Optional[Dict[str, str]], status: int, headers: Dict[str, str], body: bytes, method: str = "GET"):
+        if method.upper() != "GET" or status != 200 or len(body) > self.max_bytes:
+            return
+        blob = hashlib.sha1(body).hexdigest()
+        path = self.root / "blobs" / blob
+        if not path.exists():
+            tmp = path.with_name(blob + f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+        keep = {k: v for k, v in headers.items() if k.lower() not in _HOP_HEADERS}
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, url, status, headers, blob, size, stored, used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(url, req_headers, method), url, status, json.dumps(keep), blob, len(body), now, now),
+            )
+            self.stats["store"] += 1
+            self._evict()
+
+    def _evict(self):
+        # caller holds the lock; drop least recently used entries until under the cap
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for k, blob, size in self._db.execute("SELECT key, blob, size FROM entries ORDER BY used").fetchall():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (k,))
+            if self._db.execute("SELECT 1 FROM entries WHERE blob = ?", (blob,)).fetchone() is None:
+                (self.root / "blobs" / blob).unlink(missing_ok=True)
+            self.stats["evict"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    # Playwright: serve hits, fetch + store misses (or abort them when offline)
+    def _cacheable(self, req) -> bool:
+        return req.method == "GET" and req.resource_type in CACHE_RESOURCE_TYPES
+
+    def _handle(self, route):
+        req = route.request
+        if not self._cacheable(req):
+            return route.abort() if self.offline else route.fallback()
+        hit = self.get(req.url, req.headers)
+        if hit is not None:
+            status, headers, body = hit
+            return route.fulfill(status=status, headers=headers, body=body)
+        if self.offline:
+            return route.abort("internetdisconnected")
+        try:
+            resp = route.fetch()
+            body = resp.body()
+        except Exception:
+            return route.fallback()  # let the request fail (or succeed) the normal way
+        self.put(req.url, req.headers, resp.status, resp.headers, body)
+        return route.fulfill(response=resp, body=body)
+
+    async def _handle_async(self, route):
+        req = route.request
+        if not self._cacheable(req):
+            return await (route.abort() if self.offline else route.fallback())
+        hit = self.get(req.url, req.headers)
+        if hit is not None:
+            status, headers, body = hit
+            return await route.fulfill(status=status, headers=headers, body=body)
+        if self.offline:
+            return await route.abort("internetdisconnected")
+        try:
+            resp = await route.fetch()
+            body = await resp.body()
+        except Exception:
+            return await route.fallback()
+        self.put(req.url, req.headers, resp.status, resp.headers, body)
+        return await route.fulfill(response=resp, body=body)
+
+    def install(self, context):
+        """Install before ResourceBlocker so that blocking runs first (last registered route wins)."""
+        context.route("**/*", self._handle)
+
+    async def install_async(self, context):
+        await context.route("**/*", self._handle_async)
+
+    def summary(self) -> str:
+        with self._lock:
+            n, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        st = self.stats
+        return f"hit={st['hit']} miss={st['miss']} store={st['store']} evict={st['evict']} | entries={n} ({size / 1048576:.1f} MB){' | offline' if self.offline else ''}"
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @classmethod
+    def from_args(cls, args) -> Optional["ResponseCache"]:
+        """--cache-dir/--cache-ttl/--cache-max-mb/--offline; --offline alone uses the default directory."""
+        root = args.cache_dir or ("whova_cache" if args.offline else "")
+        if not root:
+            return None
+        return cls(Path(root), ttl_s=args.cache_ttl, max_bytes=int(args.cache_max_mb * 1024 * 1024), offline=args.offline)
+
+
+def add_cache_args(ap):
+    ap.add_argument("--cache-dir", default="", help="on-disk response cache directory (documents/xhr/scripts); '' disables unless --offline")
+    ap.add_argument("--cache-ttl", type=float, default=86400.0, help="seconds before a cached response is refetched")
+    ap.add_argument("--cache-max-mb", type=float, default=512.0, help="cache size cap; least recently used entries are evicted")
+    ap.add_argument("--offline", action="store_true", help="serve only from the response cache (default dir whova_cache); misses fail, rate limits are lifted")
+
+
+# ---------- HAR record / replay ----------
+class HarArchive:
+    """Record every browser context into <dir>/ctx-*.har, or replay a recorded directory.
+
+    Contexts are rotated, so each one records its own HAR (written when the
+    context closes). Replay registers all of them via route_from_har on top of
+    a catch-all abort, so a replayed run never touches the network.
+    """
+
+    def __init__(self, root: Path, mode: str = "replay"):
+        self.root = Path(root)
+        self.mode = mode
+        self._n = 0
+        self._lock = threading.Lock()
+        if mode == "record":
+            self.root.mkdir(parents=True, exist_ok=True)
+            self.files: List[Path] = []
+        else:
+            self.files = sorted(self.root.glob("ctx-*.har"))
+            if not self.files:
+                raise FileNotFoundError(f"no ctx-*.har files under {self.root}")
+
+    def _next_path(self) -> Path:
+        with self._lock:
+            self._n += 1
+            return self.root / f"ctx-{os.getpid()}-{threading.get_ident() % 100000}-{self._n:04d}.har"
+
+    @staticmethod
+    def _offline(route):
+        return route.abort("internetdisconnected")
+
+    def install(self, context):
+        """Install before ResourceBlocker (last registered route wins)."""
+        if self.mode == "record":
+            context.route_from_har(str(self._next_path()), update=True, update_content="embed", update_mode="minimal")
+            return
+        context.route("**/*", self._offline)
+        for f in self.files:
+            context.route_from_har(str(f), not_found="fallback")
+
+    async def install_async(self, context):
+        if self.mode == "record":
+            await context.route_from_har(str(self._next_path()), update=True, update_content="embed", update_mode="minimal")
+            return
+        await context.route("**/*", self._offline)
+        for f in self.files:
+            await context.route_from_har(str(f), not_found="fallback")
+
+    @classmethod
+    def from_args(cls, args) -> Optional["HarArchive"]:
+        return cls(Path(args.har), args.har_mode) if args.har else None
+
+
+def add_har_args(ap):
+    ap.add_argument("--har", default="", help="HAR directory: record every context into it, or replay it with no network access")
+    ap.add_argument("--har-mode", choices=["record", "replay"], default="replay")
+
+
+# ---------- Plain-HTTP tier ----------
+class HttpFetcher:
+    """Pooled keep-alive requests.Session with the same UA/proxy round robin as the browser.
+
+    Not thread-safe: use one instance per worker.
+    """
+
+    def __init__(self, uas: List[str], proxies: List[str], rotate_every: int = 30, timeout: float = 20.0, pool_size: int = 4, cache: Optional["ResponseCache"] = None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.uas = uas or [None]
+        self.proxies = proxies or [None]
+        self.rotate_every = rotate_every
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate", "Accept": "text/html,application/xhtml+xml"})
+        self._n = 0
+        self._rr = 0
+        self._rotate()
+
+    def _rotate(self):
+        ua = self.uas[self._rr % len(self.uas)]
+        proxy = self.proxies[self._rr % len(self.proxies)]
+        self._rr += 1
+        if ua:
+            self.session.headers["User-Agent"] = ua
+        self.session.headers["Accept-Language"] = random.choice(["en-US,en;q=0.9", "en-GB,en;q=0.9"])
+        self.session.proxies = {"http": proxy, "https": proxy} if proxy else {}
+
+    def get(self, url: str) -> Tuple[int, str]:
+        """(status, body); status 0 on a transport error (or an offline cache miss)."""
+        if self.cache is not None:
+            hit = self.cache.get(url, self.session.headers)
+            if hit is not None:
+                return hit[0], hit[2].decode("utf-8", errors="replace")
+            if self.cache.offline:
+                return 0, ""
+        if self.rotate_every > 0 and self._n > 0 and self._n % self.rotate_every == 0:
+            self._rotate()
+        self._n += 1
+        try:
+            r = self.session.get(url, timeout=self.timeout)
+        except Exception as e:
+            print(f"[WARN] http get failed: {e}", flush=True)
+            return 0, ""
+        if self.cache is not None and r.ok:
+            self.cache.put(url, self.session.headers, r.status_code, dict(r.headers), r.content)
+        return r.status_code, r.text if r.ok else ""
+
+    def close(self):
+        self.session.close()
+
+
+class TierStats:
+    """Per-tier hit counters for tiered fetching (http -> browser)."""
+
+    def __init__(self):
+        self.hits = Counter()
+        self.tried = Counter()
+
+    def record(self, tier: str, hit: bool):
+        self.tried[tier] += 1
+        if hit:
+            self.hits[tier] += 1
+
+    def summary(self) -> str:
+        parts = [f"{t}={self.hits[t]}/{self.tried[t]} ({100.0 * self.hits[t] / max(1, self.tried[t]):.0f}%)" for t in sorted(self.tried)]
+        return " | ".join(parts) or "-"
+
+
+# ---------- Append-only checkpoints ----------
+class CheckpointWriter:
+    """Append-only CSV checkpoint log.
+
+    Rows are appended as they are produced; checkpoint() flushes and fsyncs.
+    finalize() publishes the log to the output path via temp file + rename,
+    reusing the bytes already on disk instead of re-serializing.
+    """
+
+    def __init__(self, path: Path, header: List[str]):
+        self.path = Path(path)
+        self.header = header
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._repair()
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        self._f = self.path.open("a", newline="", encoding="utf-8")
+        self._w = csv.writer(self._f)
+        if new:
+            self._w.writerow(header)
+        self._f.flush()
+        self.start_offset = self._f.tell()  # rows before this are from earlier runs
+        self.rows = 0
+
+    def _repair(self):
+        # a crash mid-row leaves an unterminated last line; drop it
+        if not self.path.exists():
+            return
+        # only the tail is read: scan backward from the end for the last newline
+        with self.path.open("rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                step = min(pos, 64 * 1024)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                if pos == end and chunk.endswith(b"\n"):
+                    return
+                nl = chunk.rfind(b"\n")
+                if nl >= 0:
+                    f.truncate(pos - step + nl + 1)
+                    return
+                pos -= step
+            if end:
+                f.truncate(0)
+
+    def prior_rows(self) -> List[dict]:
+        """Rows written by earlier runs (everything before start_offset)."""
+        with self.path.open("rb") as f:
+            data = f.read(self.start_offset).decode("utf-8")
+        return list(csv.DictReader(io.StringIO(data, newline="")))
+
+    def append(self, rows: Iterable[List[str]]):
+        for r in rows:
+            self._w.writerow(r)
+            self.rows += 1
+
+    def checkpoint(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    @property
+    def size(self) -> int:
+        """Bytes of the log on disk (flushed first), recorded by ResumeIndex.commit()."""
+        if not self._f.closed:
+            self._f.flush()
+        return self.path.stat().st_size
+
+    def has_rows(self) -> bool:
+        with self.path.open(encoding="utf-8", newline="") as f:
+            return sum(1 for _ in zip(range(2), csv.reader(f))) > 1
+
+    def close(self):
+        if not self._f.closed:
+            self.checkpoint()
+            self._f.close()
+
+    def finalize(self, out_path: Path, rows: Optional[Iterable[List[str]]] = None) -> bool:
+        """Atomically write out_path: a copy of the log, or `rows` if the final set differs from it.
+
+        An empty result never replaces a published CSV that has rows; returns False then.
+        """
+        self.close()
+        out_path = Path(out_path)
+        rows = None if rows is None else list(rows)
+        empty = not rows if rows is not None else not self.has_rows()
+        if empty and read_csv_rows(out_path, self.header):
+            print(f"[WARN] empty result; keeping the existing {out_path}", flush=True)
+            return False
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out_path.with_name(out_path.name + ".tmp")
+        with tmp.open("w", newline="", encoding="utf-8") as f:
+            if rows is None:
+                with self.path.open(encoding="utf-8", newline="") as src:
+                    shutil.copyfileobj(src, f)
+            else:
+                w = csv.writer(f)
+                w.writerow(self.header)
+                w.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, out_path)
+        return True
+
+
+# ---------- Persistent resume index ----------
+def resume_key(url: str, *fallback: str) -> str:
+    """Stable key: numeric Whova session id from the URL, else the normalized fallback fields."""
+    sid = whova_session_id(url)
+    if sid:
+        return f"id:{sid}"
+    return "k:" + "|".join(re.sub(r"\s+", " ", (x or "").strip()).lower() for x in fallback)
+
+
+class ResumeIndex:
+    """SQLite set of processed keys; opening it does not scan any CSV.
+
+    Thread-safe. add() is durable once commit() returns. commit(log_size) also
+    records how many bytes of the checkpoint log the keys cover; sync() rebuilds
+    the set from the log whenever the two disagree (log deleted or truncated,
+    or rows flushed to the log after the last index commit before a crash).
+    """
+
+    def __init__(self, path: Path):
+        import sqlite3
+
+        self.path = Path(path)
+        self.fresh = not self.path.exists()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS done (key TEXT PRIMARY KEY)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        self._lock = threading.Lock()
+
+    def synced_size(self) -> Optional[int]:
+        with self._lock:
+            r = self._db.execute("SELECT v FROM meta WHERE k = 'log_size'").fetchone()
+        return int(r[0]) if r else None
+
+    def sync(self, log: "CheckpointWriter", keys: Callable[[List[dict]], Iterable[str]]) -> bool:
+        """Rebuild from log.prior_rows() unless the index already covers exactly that log."""
+        if self.synced_size() == log.start_offset:
+            return False
+        with self._lock:
+            self._db.execute("DELETE FROM done")
+        self.add_many(keys(log.prior_rows()))
+        self.commit(log.start_offset)
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM done WHERE key = ?", (key,)).fetchone() is not None
+
+    def add(self, key: str):
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO done (key) VALUES (?)", (key,))
+
+    def add_many(self, keys: Iterable[str]):
+        with self._lock:
+            self._db.executemany("INSERT OR IGNORE INTO done (key) VALUES (?)", ((k,) for k in keys))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM done").fetchone()[0]
+
+    def commit(self, log_size: Optional[int] = None):
+        with self._lock:
+            if log_size is not None:
+                self._db.execute("INSERT OR REPLACE INTO meta (k, v) VALUES ('log_size', ?)", (str(log_size),))
+            self._db.commit()
+
+    def close(self, log_size: Optional[int] = None):
+        self.commit(log_size)
+        self._db.close()
+
+
+# ---------- Resolved Whova frame cache ----------
+class FrameCache:
+    """JSON map: conference URL -> {"embed_url", "direct", "ts"} from a previous frame discovery."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            self.data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.data = {}
+
+    def get(self, url: str) -> Optional[dict]:
+        e = self.data.get(url)
+        return e if isinstance(e, dict) and e.get("embed_url") else None
+
+    def put(self, url: str, embed_url: str, direct: bool):
+        self.data[url] = {"embed_url": embed_url, "direct": bool(direct), "ts": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        self._save()
+
+    def drop(self, url: str):
+        if self.data.pop(url, None) is not None:
+            self._save()
+
+    def _save(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+# ---------- Incremental refresh ----------
+def fingerprint(obj) -> str:
+    """Content hash of any JSON-serializable value (a card record, a row, a page body)."""
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """SQLite map: content fingerprint -> the row(s) extracted from that content.
+
+    A card (or subsession page body) whose fingerprint is known is not re-extracted; prune() drops
+    fingerprints that were not seen in the latest full pass.
+    """
+
+    def __init__(self, path: Path):
+        import sqlite3
+
+        self.path = Path(path)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS fp (fp TEXT PRIMARY KEY, row TEXT, ts REAL)")
+        self._lock = threading.Lock()
+
+    def get(self, fp: str) -> Optional[List[str]]:
+        with self._lock:
+            r = self._db.execute("SELECT row FROM fp WHERE fp = ?", (fp,)).fetchone()
+        return json.loads(r[0]) if r else None
+
+    def put(self, fp: str, row: List[str]):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO fp (fp, row, ts) VALUES (?, ?, ?)", (fp, json.dumps(row, ensure_ascii=False), time.time()))
+
+    def prune(self, keep: Set[str]) -> int:
+        with self._lock:
+            stale = [f for (f,) in self._db.execute("SELECT fp FROM fp").fetchall() if f not in keep]
+            self._db.executemany("DELETE FROM fp WHERE fp = ?", ((f,) for f in stale))
+        return len(stale)
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+def sharp_drop(old: int, new: int, max_drop: float) -> bool:
+    """True when a refresh saw more than `max_drop` (a fraction) fewer rows than were published."""
+    return old > 0 and new < old * (1.0 - max_drop)
+
+
+def read_csv_rows(path: Path, header: List[str]) -> List[List[str]]:
+    """Rows of a published CSV in `header` column order ([] if it does not exist yet)."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8", newline="") as f:
+        return [[r.get(h, "") or "" for h in header] for r in csv.DictReader(f)]
+
+
+def diff_rows(old: Dict[str, List[str]], new: Dict[str, List[str]], header: List[str]) -> List[Tuple[str, str, List[str], str]]:
+    """(change, key, row, changed_fields) for added / removed / modified keys; new-side order first."""
+    out = []
+    for k, row in new.items():
+        if k not in old:
+            out.append(("added", k, row, ""))
+        elif old[k] != row:
+            changed = [h for h, a, b in zip(header, old[k], row) if a != b]
+            out.append(("modified", k, row, ";".join(changed)))
+    out.extend(("removed", k, row, "") for k, row in old.items() if k not in new)
+    return out
+
+
+def append_changelog(path: Path, header: List[str], changes: List[Tuple[str, str, List[str], str]]):
+    """Append one refresh's changes to a CSV change log (run_at, change, key, changed_fields, *header)."""
+    path = Path(path)
+    new = not path.exists() or path.stat().st_size == 0
+    run_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with path.open("a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if new:
+            w.writerow(["run_at", "change", "key", "changed_fields", *header])
+        for change, key, row, fields in changes:
+            w.writerow([run_at, change, key, fields, *row])
+
+
+# ---------- Shared work queue (lease/ack) ----------
+class WorkQueue:
+    """SQLite-backed task queue with leases, for workers on one box or a shared directory.
+
+    A producer that streams tasks in (the events scraper with --pipe-queue)
+    calls seal() when it is done, so that followers know when to stop waiting.
+
+    lease() hands out the lowest-position pending task (expired leases are
+    requeued first). ack() stores the task's result rows and marks it done in
+    one transaction, and only if the caller still holds the lease, so a task
+    is never recorded twice. Tasks failing max_attempts times become 'failed'.
+    """
+
+    def __init__(self, path: Path, max_attempts: int = 3):
+        import sqlite3
+
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self._db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks (key TEXT PRIMARY KEY, pos INTEGER, payload TEXT,"
+            " state TEXT DEFAULT 'pending', worker TEXT, lease_until REAL DEFAULT 0, attempts INTEGER DEFAULT 0)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, rows TEXT)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS tasks_state_pos ON tasks (state, pos)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        self._lock = threading.Lock()
+
+    def _tx(self, fn):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(self._db)
+                self._db.execute("COMMIT")
+                return out
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def enqueue_many(self, items: Iterable[Tuple[str, int, dict]]) -> int:
+        """(key, pos, payload) triples; existing keys are left untouched."""
+        rows = [(k, pos, json.dumps(payload, ensure_ascii=False)) for k, pos, payload in items]
+        return self._tx(lambda db: db.executemany("INSERT OR IGNORE INTO tasks (key, pos, payload) VALUES (?, ?, ?)", rows).rowcount)
+
+    def lease(self, worker: str, ttl_s: float = 120.0) -> Optional[Tuple[str, int, dict]]:
+        def fn(db):
+            now = time.time()
+            db.execute("UPDATE tasks SET state = 'failed' WHERE state = 'leased' AND lease_until < ? AND attempts >= ?", (now, self.max_attempts))
+            db.execute("UPDATE tasks SET state = 'pending', worker = NULL WHERE state = 'leased' AND lease_until < ?", (now,))
+            row = db.execute("SELECT key, pos, payload FROM tasks WHERE state = 'pending' ORDER BY pos LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE tasks SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE key = ?",
+                (worker, now + ttl_s, row[0]),
+            )
+            return row[0], row[1], json.loads(row[2])
+
+        return self._tx(fn)
+
+    def heartbeat(self, key: str, worker: str, ttl_s: float = 120.0) -> bool:
+        def fn(db):
+            cur = db.execute(
+                "UPDATE tasks SET lease_until = ? WHERE key = ? AND worker = ? AND state = 'leased'",
+                (time.time() + ttl_s, key, worker),
+            )
+            return cur.rowcount == 1
+
+        return self._tx(fn)
+
+    def ack(self, key: str, worker: str, rows: List[List[str]]) -> bool:
+        def fn(db):
+            cur = db.execute("UPDATE tasks SET state = 'done' WHERE key = ? AND worker = ? AND state = 'leased'", (key, worker))
+            if cur.rowcount != 1:
+                return False  # lease lost (expired and taken by someone else)
+            db.execute("INSERT OR REPLACE INTO results (key, rows) VALUES (?, ?)", (key, json.dumps(rows, ensure_ascii=False)))
+            return True
+
+        return self._tx(fn)
+
+    def nack(self, key: str, worker: str):
+        """Give a lease back early; the task retries unless it is out of attempts."""
+        self._tx(
+            lambda db: db.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+                " worker = NULL, lease_until = 0 WHERE key = ? AND worker = ? AND state = 'leased'",
+                (self.max_attempts, key, worker),
+            )
+        )
+
+    def seal(self):
+        """Producer is done adding tasks; followers may exit once the queue drains."""
+        self._tx(lambda db: db.execute("INSERT OR REPLACE INTO meta (k, v) VALUES ('sealed', '1')"))
+
+    def sealed(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT v FROM meta WHERE k = 'sealed'").fetchone() is not None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+
+    def results(self) -> List[List[str]]:
+        """All result rows in task position order."""
+        with self._lock:
+            cur = self._db.execute("SELECT r.rows FROM results r JOIN tasks t ON t.key = r.key ORDER BY t.pos")
+            return [row for (rows,) in cur.fetchall() for row in json.loads(rows)]
+
+    def close(self):
+        self._db.close()
+
+
+class LeaseKeeper:
+    """Background heartbeat for the lease a worker currently holds."""
+
+    def __init__(self, queue: WorkQueue, worker: str, ttl_s: float):
+        self.queue, self.worker, self.ttl_s = queue, worker, ttl_s
+        self.key: Optional[str] = None
+        self._stop = threading.Event()
+        self._t = threading.Thread(target=self._run, daemon=True)
+        self._t.start()
+
+    def _run(self):
+        while not self._stop.wait(self.ttl_s / 3.0):
+            key = self.key
+            if key:
+                try:
+                    self.queue.heartbeat(key, self.worker, self.ttl_s)
+                except Exception as e:
+                    print(f"[WARN] heartbeat failed: {e}", flush=True)
+
+    def stop(self):
+        self._stop.set()
+
+
+def spawn_module(module: str, args: List[str]) -> subprocess.Popen:
+    """Start `python -m whova.<module> *args` as a child, whatever the parent's cwd."""
+    env = dict(os.environ)
+    root = str(Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (root, env.get("PYTHONPATH", "")) if p)
+    return subprocess.Popen([sys.executable, "-m", f"{__package__}.{module}", *args], env=env)
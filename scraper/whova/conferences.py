@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Conference profiles for the Whova scrapers.
+
+A profile is everything that used to differ between the per-year script copies:
+the agenda URL, where the CSVs go, and optional selector overrides. Both stage
+CLIs take `--conf <name>` to start from a profile; flags given explicitly win.
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Optional
+
+SCRAPER_ROOT = Path(__file__).resolve().parent.parent
+STAGES = ("events", "subsessions")
+
+
+@dataclass(frozen=True)
+class Conference:
+    name: str
+    url: str
+    workdir: Path
+    title_selectors: List[str] = field(default_factory=list)
+    location_selector: str = ""
+    chip_selector: str = ""
+
+    @property
+    def events_csv(self) -> Path:
+        return self.workdir / f"{self.name}_events.csv"
+
+    @property
+    def subsessions_csv(self) -> Path:
+        return self.workdir / f"{self.name}_subsessions.csv"
+
+    def events_argv(self) -> List[str]:
+        argv = ["--url", self.url, "--out", str(self.events_csv), "--pipe-out", str(self.subsessions_csv)]
+        if self.title_selectors:
+            argv += ["--title-selectors", *self.title_selectors]
+        if self.location_selector:
+            argv += ["--location-selector", self.location_selector]
+        if self.chip_selector:
+            argv += ["--chip-selector", self.chip_selector]
+        return argv
+
+    def subsessions_argv(self) -> List[str]:
+        return ["--in", str(self.events_csv), "--out", str(self.subsessions_csv)]
+
+
+# The Whova agenda embeds are opened directly (no conference-site iframe hop).
+CONFERENCES: Dict[str, Conference] = {
+    "kdd2024": Conference(
+        name="kdd2024",
+        url="https://whova.com/embedded/event/avBTMdVt9LpKU8wGBhyS7P0tL-aSotzP6HuqmCh%40ZhY%3D/",
+        workdir=SCRAPER_ROOT / "kdd2024",
+    ),
+    "kdd2025": Conference(
+        name="kdd2025",
+        url="https://whova.com/embedded/event/bMmjr7UCYdEHcXQvuqfVt0Si3cTgbY5AgOHyJZbjDyk%3D/",
+        workdir=SCRAPER_ROOT / "kdd2025",
+    ),
+}
+
+
+def load_conferences(path: Optional[Path] = None) -> Dict[str, Conference]:
+    """Built-in profiles, plus/overridden by a JSON list of profile objects.
+
+    Example entry: {"name": "kdd2026", "url": "...", "workdir": "scraper/kdd2026",
+    "title_selectors": ["span.session-title"]}. workdir defaults to scraper/<name>.
+    """
+    confs = dict(CONFERENCES)
+    if path:
+        for d in json.loads(Path(path).read_text(encoding="utf-8")):
+            d = dict(d)
+            d["workdir"] = Path(d.get("workdir") or SCRAPER_ROOT / d["name"])
+            confs[d["name"]] = Conference(**d)
+    return confs
+
+
+def add_profile_args(ap):
+    ap.add_argument("--conf", default="", help="start from this conference profile's flags (see whova/conferences.py)")
+    ap.add_argument("--profiles", default="", help="JSON list of extra/overriding conference profiles")
+
+
+def with_profile(argv: Optional[List[str]], stage: str) -> List[str]:
+    """argv (default sys.argv[1:]) prefixed with the --conf profile's flags for `stage`.
+
+    The explicit flags come last, so argparse lets them override the profile.
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    pre = argparse.ArgumentParser(add_help=False)
+    add_profile_args(pre)
+    known, _ = pre.parse_known_args(argv)
+    if not known.conf:
+        return argv
+    confs = load_conferences(Path(known.profiles) if known.profiles else None)
+    if known.conf not in confs:
+        raise SystemExit(f"[FATAL] unknown conference {known.conf!r}; known: {sorted(confs)}")
+    conf = confs[known.conf]
+    return (conf.events_argv() if stage == "events" else conf.subsessions_argv()) + argv
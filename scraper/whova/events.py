@@ -0,0 +1,1068 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import argparse
+import contextlib
+import re
+import time
+import random
+import shlex
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from urllib.parse import urljoin
+from urllib.parse import urlparse
+from datetime import datetime
+from bs4 import BeautifulSoup
+from bs4 import NavigableString
+from bs4 import Tag
+from playwright.sync_api import sync_playwright
+from playwright.sync_api import Error as PWError
+from .common import Backoff
+from .common import BrowserPool
+from .common import CheckpointWriter
+from .common import DEFAULT_BLOCK_DOMAINS
+from .common import DEFAULT_BLOCK_RESOURCES
+from .common import FingerprintStore
+from .common import FrameCache
+from .common import HarArchive
+from .common import RateLimiter
+from .common import ResponseCache
+from .common import ResumeIndex
+from .common import ResourceBlocker
+from .common import WHOVA_EVENT_TOKEN
+from .common import WhovaCapture
+from .common import WorkQueue
+from .common import add_cache_args
+from .common import add_har_args
+from .common import append_changelog
+from .common import clock_style
+from .common import diff_rows
+from .common import fingerprint
+from .common import first_paint_ms
+from .common import parse_host_rps
+from .common import read_csv_rows
+from .common import resume_key
+from .common import sharp_drop
+from .common import spawn_module
+from .common import whova_session_id
+from .conferences import add_profile_args
+from .conferences import with_profile
+
+
+# ---------- Data model ----------
+@dataclass
+class Event:
+    title: str
+    time: str
+    location: str
+    tags: List[str]
+    url: str
+
+
+def nrm(s: str) -> str:
+    return re.sub(r"\s+", " ", (s or "").strip())
+
+
+TIME_PAT = re.compile(r"(?i)\b\d{1,2}:\d{2}\s?(?:am|pm)\s?[-–—]\s?\d{1,2}:\d{2}\s?(?:am|pm)\b")
+
+
+# ---------- UA / Proxy rotation ----------
+def load_lines(p: Optional[str]) -> List[str]:
+    if not p:
+        return []
+    path = Path(p)
+    if not path.exists():
+        return []
+    return [nrm(x) for x in path.read_text(encoding="utf-8").splitlines() if nrm(x)]
+
+
+DEFAULT_UAS = [
+    # 代表的なChromium系
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0 Safari/537.36",
+]
+
+
+def next_round_robin(seq: List[str], idx: int) -> Tuple[Optional[str], int]:
+    if not seq:
+        return None, idx
+    return seq[idx % len(seq)], idx + 1
+
+
+# ---------- Whova helpers (embed → direct fallback) ----------
+def get_whova_frame_or_open_direct(page, first_timeout_ms=30000):
+    # the page is the Whova agenda itself (profile URL points at the embed): no iframe to wait for
+    if WHOVA_EVENT_TOKEN.search(page.url or ""):
+        return page.main_frame, False
+
+    # try to get iframe
+    deadline = time.time() + first_timeout_ms / 1000.0
+    whova_iframe = None
+    while time.time() < deadline and whova_iframe is None:
+        loc = page.locator("iframe[src*='whova']")
+        if loc.count() > 0:
+            whova_iframe = loc.first
+            break
+        page.wait_for_timeout(500)
+
+    target_frame = None
+    if whova_iframe is not None:
+        try:
+            target_frame = whova_iframe.content_frame()
+        except Exception:
+            target_frame = None
+
+    if target_frame is not None:
+        try:
+            if target_frame.locator("div.session").count() > 0:
+                return target_frame, False
+        except Exception:
+            pass
+
+    # open direct
+    try:
+        src = page.locator("iframe[src*='whova']").first.get_attribute("src", timeout=5000)
+    except Exception:
+        src = None
+    if src:
+        page.goto(src, wait_until="domcontentloaded", timeout=60000)
+        return page.main_frame, True
+
+    return page.main_frame, False
+
+
+def resolve_whova_frame(page, hit: Optional[dict], first_timeout_ms=30000):
+    """(frame, opened_direct, from_cache) for a page already opened on the conference URL,
+    or on the cached embed URL when the cache says direct-open was needed."""
+    if hit and hit["direct"]:
+        return page.main_frame, True, True
+    if hit:
+        try:
+            el = page.wait_for_selector("iframe[src*='whova']", state="attached", timeout=first_timeout_ms)
+            fr = el.content_frame() if el else None
+            if fr is not None:
+                return fr, False, True
+        except PWError:
+            pass
+        print("[WARN] cached frame strategy failed; rediscovering", flush=True)
+    fr, opened_direct = get_whova_frame_or_open_direct(page, first_timeout_ms=first_timeout_ms)
+    return fr, opened_direct, False
+
+
+# -1 while the Whova "Loading" splash is up, else the div.session count (one round trip)
+SESSIONS_PROBE_JS = """
+() => {
+  const t = (document.body && document.body.innerText) || "";
+  if (t.includes("Loading") && t.includes("Whova")) return -1;
+  return document.querySelectorAll("div.session").length;
+}
+"""
+
+
+def wait_sessions_with_watchdog(frame, page, min_cnt=5, overall_ms=60000, rate: Optional[RateLimiter] = None):
+    start = time.time()
+    last = -1
+    while (time.time() - start) * 1000 < overall_ms:
+        try:
+            cnt = frame.evaluate(SESSIONS_PROBE_JS)
+        except Exception:
+            cnt = 0
+        if cnt < 0:
+            page.wait_for_timeout(800)
+            continue
+
+        if cnt != last:
+            print(f"[LOG]  session count={cnt}", flush=True)
+            last = cnt
+        if cnt >= min_cnt:
+            return cnt
+
+        try:
+            frame.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        except Exception:
+            pass
+        if rate:
+            rate.wait(frame.url)
+        else:
+            page.wait_for_timeout(700)
+    return last if last >= 0 else 0
+
+
+# MutationObserver keeps count/lastChange inside the frame; the predicate runs
+# in-page on every animation frame, so nothing but the final result crosses IPC.
+SESSIONS_OBSERVER_JS = """
+() => {
+  if (window.__whovaReady) return;
+  const r = { count: 0, lastChange: performance.now(), lastScroll: 0 };
+  const update = () => {
+    const n = document.querySelectorAll("div.session").length;
+    if (n !== r.count) { r.count = n; r.lastChange = performance.now(); }
+  };
+  new MutationObserver(update).observe(document.documentElement, { childList: true, subtree: true });
+  update();
+  window.__whovaReady = r;
+}
+"""
+
+SESSIONS_READY_JS = """
+([minCnt, settleMs]) => {
+  const r = window.__whovaReady;
+  if (!r) return false;
+  const now = performance.now();
+  const quiet = now - r.lastChange;
+  if (r.count >= minCnt && quiet >= settleMs) return r.count;
+  // still short of minCnt and nothing new: nudge lazy loading once per settle window
+  if (r.count < minCnt && quiet >= settleMs && now - r.lastScroll >= settleMs) {
+    r.lastScroll = now;
+    window.scrollTo(0, document.body ? document.body.scrollHeight : 0);
+  }
+  return false;
+}
+"""
+
+
+def wait_sessions_ready(frame, min_cnt=5, settle_ms=1200, overall_ms=60000) -> Tuple[int, float]:
+    """Resolve once div.session count >= min_cnt and has not grown for settle_ms.
+    Returns (count, seconds to ready)."""
+    t0 = time.time()
+    try:
+        frame.evaluate(SESSIONS_OBSERVER_JS)
+        h = frame.wait_for_function(SESSIONS_READY_JS, arg=[min_cnt, settle_ms], polling="raf", timeout=overall_ms)
+        cnt = int(h.json_value())
+    except PWError:
+        try:
+            cnt = frame.evaluate("window.__whovaReady ? window.__whovaReady.count : document.querySelectorAll('div.session').length")
+        except PWError:
+            cnt = 0
+    dt = time.time() - t0
+    print(f"[TIME] sessions ready count={cnt} in {dt:.2f}s", flush=True)
+    return cnt, dt
+
+
+# ---------- Extraction (content-col only for title etc.) ----------
+def extract_event_from_session(frame, session_nth, base_url: str, sel: Optional["Selectors"] = None) -> Optional[Event]:
+    sel = sel or DEFAULT_SELECTORS
+    s = frame.locator("div.session").nth(session_nth)
+
+    try:
+        s.scroll_into_view_if_needed(timeout=1500)
+        frame.page.wait_for_timeout(120)
+    except Exception:
+        pass
+
+    content = s.locator("div.content-col")
+    timecol = s.locator("div.time-col")
+
+    # time
+    time_str = ""
+    try:
+        if timecol.count():
+            t = nrm(timecol.first.inner_text(timeout=1000))
+            m = TIME_PAT.search(t)
+            time_str = m.group(0) if m else t
+        if not time_str:
+            m = TIME_PAT.search(nrm(s.inner_text(timeout=1000)))
+            if m:
+                time_str = m.group(0)
+    except Exception:
+        pass
+
+    # title (content-col only)
+    title = ""
+    try:
+        for title_sel in sel.title:
+            loc = content.locator(title_sel) if content.count() else s.locator(title_sel)
+            if loc.count() > 0:
+                t = nrm(loc.first.inner_text(timeout=1200))
+                if t and not TIME_PAT.fullmatch(t):
+                    title = t
+                    break
+
+        if not title and content.count():
+            head = content.get_by_role("heading")
+            if head.count() > 0:
+                t = nrm(head.first.inner_text(timeout=800))
+                if t and not TIME_PAT.search(t):
+                    title = t
+
+        if not title:
+            txt = content.inner_text(timeout=1500) if content.count() else s.inner_text(timeout=1500)
+            lines = [nrm(x) for x in (txt or "").splitlines()]
+            cand = [ln for ln in lines if len(ln) >= 6 and not TIME_PAT.search(ln) and not re.match(r"(?i)^(location|room|hall|venue)\s*[:：]", ln) and not ln.lower().startswith("session chair:")]
+            if cand:
+                title = cand[0]
+    except Exception:
+        pass
+
+    # location
+    location = ""
+    try:
+        ll = content.locator(sel.location) if content.count() else s.locator(sel.location)
+        if ll.count() > 0:
+            location = nrm(ll.first.inner_text(timeout=800))
+        else:
+            txt = nrm(content.inner_text(timeout=800)) if content.count() else nrm(s.inner_text(timeout=800))
+            m = re.search(r"(?i)\b(?:Location|Room|Hall|Venue)\s*:\s*(.+)", txt)
+            if m:
+                location = nrm(m.group(1))
+    except Exception:
+        pass
+
+    # tags
+    tags: List[str] = []
+    try:
+        chips = content.locator(sel.chip) if content.count() else s.locator(sel.chip)
+        c = min(chips.count(), 20)
+        for i in range(c):
+            t = nrm(chips.nth(i).inner_text(timeout=600))
+            if not t:
+                continue
+            if re.search(r"(?i)\b(location|room|hall|venue|time|am|pm)\b", t):
+                continue
+            if 2 <= len(t) <= 40 and t not in tags:
+                tags.append(t)
+    except Exception:
+        pass
+
+    # url (normal link)
+    url = ""
+    try:
+        a_loc = content.locator("a[href]:has-text('view more detailed information'), a[href]") if content.count() else s.locator("a[href]:has-text('view more detailed information'), a[href]")
+        if a_loc.count() > 0:
+            href = a_loc.first.get_attribute("href", timeout=800)
+            if href:
+                tmp = urljoin(base_url, href)
+                if urlparse(tmp).scheme:
+                    url = tmp
+    except Exception:
+        pass
+
+    # subsessions fallback (card-scoped)
+    if not url:
+        url = session_link_by_click(frame, session_nth)
+
+    if not any([title, time_str, location, url]):
+        return None
+    if title and TIME_PAT.search(title):
+        title = nrm(TIME_PAT.sub("", title)).strip(" -–—")
+        if not title:
+            return None
+
+    return Event(title=title, time=time_str, location=location, tags=tags, url=url)
+
+
+def session_link_by_click(frame, session_nth) -> str:
+    """Session URL of a card that only links to it through the subsessions chip:
+    click, read the URL navigated to, and go back to the agenda."""
+    url = ""
+    try:
+        clickable = frame.locator("div.session").nth(session_nth).locator("span.session-subs, .session-subs").first
+        if clickable.count() > 0:
+            old = frame.url
+            with frame.expect_navigation(timeout=6000):
+                clickable.click(force=True)
+            url = frame.url or ""
+            if old:
+                try:
+                    frame.goto(old, wait_until="domcontentloaded", timeout=15000)
+                except Exception:
+                    pass
+            if url and not urlparse(url).scheme:
+                url = ""
+    except Exception:
+        pass
+    return url
+
+
+# ---------- Batch extraction (single frame.evaluate for all cards) ----------
+# Mirrors the selector fallbacks of extract_event_from_session, but returns raw
+# texts for every div.session in one IPC round trip. Filtering stays in Python.
+@dataclass(frozen=True)
+class Selectors:
+    """Card selectors shared by every extractor; conference profiles may override them."""
+
+    title: Tuple[str, ...] = (
+        "div.session-title-row-left span.session-title",
+        "span.session-title",
+        ".session-title",
+        "h1, h2, h3",
+        "a[title]",
+        "a strong",
+        "strong",
+    )
+    location: str = "div.session-location, .session-location, .location"
+    # the old ".session-tracks >> *, [class*='tag'], ..." locator scopes the whole comma
+    # list under .session-tracks, which reduces to every descendant of .session-tracks
+    chip: str = ".session-tracks *"
+
+    def js_args(self) -> list:
+        """[titles, location, chip], the order CARD_RECORD_JS expects."""
+        return [list(self.title), self.location, self.chip]
+
+    @classmethod
+    def from_args(cls, title: Optional[List[str]] = None, location: Optional[str] = None, chip: Optional[str] = None) -> "Selectors":
+        d = cls()
+        return cls(title=tuple(title) if title else d.title, location=location or d.location, chip=chip or d.chip)
+
+
+DEFAULT_SELECTORS = Selectors()
+
+# one card -> record; shared by the batch call and the per-card resume pre-filter
+CARD_RECORD_JS = """
+(s, [titleSels, locSel, chipSel]) => {
+  const txt = (el) => (el && (el.innerText || el.textContent)) || "";
+  const content = s.querySelector("div.content-col");
+  const scope = content || s;
+  const timecol = s.querySelector("div.time-col");
+  const titles = titleSels.map((sel) => {
+    const el = scope.querySelector(sel);
+    return el ? txt(el) : null;
+  });
+  const head = content ? content.querySelector("h1, h2, h3, h4, h5, h6, [role='heading']") : null;
+  const loc = scope.querySelector(locSel);
+  const chips = Array.from(scope.querySelectorAll(chipSel)).slice(0, 20).map(txt);
+  const a = scope.querySelector("a[href]");
+  return {
+    card_text: txt(s),
+    content_text: txt(scope),
+    time_text: timecol ? txt(timecol) : null,
+    titles: titles,
+    heading: head ? txt(head) : null,
+    location: loc ? txt(loc) : null,
+    chips: chips,
+    href: a ? a.getAttribute("href") : null,
+    has_subs: !!s.querySelector("span.session-subs, .session-subs"),
+  };
+}
+"""
+
+BATCH_EXTRACT_JS = (
+    "(args) => { const card = "
+    + CARD_RECORD_JS.strip()
+    + '; return Array.from(document.querySelectorAll("div.session")).map((s) => card(s, args)); }'
+)
+
+
+def extract_records_batch(frame, sel: Selectors = DEFAULT_SELECTORS) -> List[dict]:
+    try:
+        return frame.evaluate(BATCH_EXTRACT_JS, sel.js_args()) or []
+    except PWError as e:
+        print(f"[WARN] batch extract failed: {e}", flush=True)
+        return []
+
+
+def extract_record_card(frame, session_nth, sel: Selectors = DEFAULT_SELECTORS) -> Optional[dict]:
+    """Record for a single card in one call (no scrolling, no per-field locators)."""
+    try:
+        return frame.locator("div.session").nth(session_nth).evaluate(CARD_RECORD_JS, sel.js_args(), timeout=2000)
+    except PWError:
+        return None
+
+
+def event_from_record(rec: dict, base_url: str) -> Tuple[Optional[Event], bool]:
+    """Build an Event from a batch record. Returns (event, complete); incomplete
+    cards should be re-extracted with extract_event_from_session."""
+    # time
+    time_str = ""
+    if rec.get("time_text") is not None:
+        t = nrm(rec["time_text"])
+        m = TIME_PAT.search(t)
+        time_str = m.group(0) if m else t
+    if not time_str:
+        m = TIME_PAT.search(nrm(rec.get("card_text", "")))
+        if m:
+            time_str = m.group(0)
+
+    # title
+    title = ""
+    for t in rec.get("titles") or []:
+        if t is None:
+            continue
+        t = nrm(t)
+        if t and not TIME_PAT.fullmatch(t):
+            title = t
+            break
+    if not title and rec.get("heading"):
+        t = nrm(rec["heading"])
+        if t and not TIME_PAT.search(t):
+            title = t
+    if not title:
+        lines = [nrm(x) for x in (rec.get("content_text") or "").splitlines()]
+        cand = [ln for ln in lines if len(ln) >= 6 and not TIME_PAT.search(ln) and not re.match(r"(?i)^(location|room|hall|venue)\s*[:：]", ln) and not ln.lower().startswith("session chair:")]
+        if cand:
+            title = cand[0]
+
+    # location
+    location = ""
+    if rec.get("location") is not None:
+        location = nrm(rec["location"])
+    else:
+        m = re.search(r"(?i)\b(?:Location|Room|Hall|Venue)\s*:\s*(.+)", nrm(rec.get("content_text", "")))
+        if m:
+            location = nrm(m.group(1))
+
+    # tags
+    tags: List[str] = []
+    for t in rec.get("chips") or []:
+        t = nrm(t)
+        if not t:
+            continue
+        if re.search(r"(?i)\b(location|room|hall|venue|time|am|pm)\b", t):
+            continue
+        if 2 <= len(t) <= 40 and t not in tags:
+            tags.append(t)
+
+    # url
+    url = ""
+    if rec.get("href"):
+        tmp = urljoin(base_url, rec["href"])
+        if urlparse(tmp).scheme:
+            url = tmp
+
+    # subsession links need a live click; title-less cards may have a role=heading
+    complete = bool(title) and (bool(url) or not rec.get("has_subs"))
+
+    if not any([title, time_str, location, url]):
+        return None, complete
+    if title and TIME_PAT.search(title):
+        title = nrm(TIME_PAT.sub("", title)).strip(" -–—")
+        if not title:
+            return None, complete
+
+    return Event(title=title, time=time_str, location=location, tags=tags, url=url), complete
+
+
+# ---------- Offline extraction (one fr.content() snapshot, parsed in Python) ----------
+_BLOCK_TAGS = frozenset("address article aside blockquote dd div dl dt figure footer form h1 h2 h3 h4 h5 h6 header hr li main nav ol p pre section table tr ul".split())
+
+
+def _html_text(el, lines: bool = False) -> str:
+    """innerText stand-in: inline markup joins ("Graph<b>RAG</b>" -> "GraphRAG"),
+    and with lines=True block elements and <br> start new lines."""
+    if el is None:
+        return ""
+    if not lines:
+        return el.get_text("")
+    out: List[str] = []
+
+    def walk(node):
+        for c in node.children:
+            if isinstance(c, Tag):
+                if c.name in ("script", "style"):
+                    continue
+                brk = c.name in _BLOCK_TAGS or c.name == "br"
+                if brk:
+                    out.append("\n")
+                walk(c)
+                if brk:
+                    out.append("\n")
+            elif type(c) is NavigableString:
+                out.append(str(c))
+
+    walk(el)
+    return "".join(out)
+
+
+def extract_records_html(html: str, sel: Selectors = DEFAULT_SELECTORS) -> List[dict]:
+    """Same record shape as BATCH_EXTRACT_JS, built from an HTML snapshot."""
+    soup = BeautifulSoup(html or "", "html.parser")
+    records: List[dict] = []
+    for s in soup.select("div.session"):
+        content = s.select_one("div.content-col")
+        scope = content or s
+        timecol = s.select_one("div.time-col")
+        titles = []
+        for title_sel in sel.title:
+            el = scope.select_one(title_sel)
+            titles.append(_html_text(el) if el is not None else None)
+        head = content.select_one("h1, h2, h3, h4, h5, h6, [role='heading']") if content is not None else None
+        loc = scope.select_one(sel.location)
+        a = scope.select_one("a[href]")
+        records.append(
+            {
+                "card_text": _html_text(s, lines=True),
+                "content_text": _html_text(scope, lines=True),
+                "time_text": _html_text(timecol) if timecol is not None else None,
+                "titles": titles,
+                "heading": _html_text(head) if head is not None else None,
+                "location": _html_text(loc) if loc is not None else None,
+                "chips": [_html_text(c) for c in scope.select(sel.chip)[:20]],
+                "href": a.get("href") if a is not None else None,
+                "has_subs": s.select_one("span.session-subs, .session-subs") is not None,
+            }
+        )
+    return records
+
+
+def extract_events_html(html: str, base_url: str, sel: Selectors = DEFAULT_SELECTORS) -> List[Tuple[dict, Optional[Event], bool]]:
+    """(record, event, complete) per div.session of an HTML snapshot, in card order;
+    incomplete cards still need the live extract_event_from_session fallback."""
+    return [(rec, *event_from_record(rec, base_url)) for rec in extract_records_html(html, sel)]
+
+
+# ---------- CSV helpers ----------
+EVENT_HEADER = ["title", "time", "location", "tags", "url"]
+
+
+def event_row(e: Event) -> List[str]:
+    return [e.title, e.time, e.location, ";".join(e.tags), e.url]
+
+
+def event_from_row(row: List[str]) -> Event:
+    title, tm, loc, tags, url = row
+    return Event(title=title, time=tm, location=loc, tags=[t for t in tags.split(";") if t], url=url)
+
+
+def event_key(e: Event) -> str:
+    """Resume/dedupe key: Whova session id when the card links to one, else title+time."""
+    return resume_key(e.url, e.title, e.time)
+
+
+def event_index_keys(url: str, title: str, tm: str) -> List[str]:
+    """Keys indexed for a kept row: its event_key plus the title+time alias.
+
+    A card whose session link only appears after a click is read with url=""
+    (key k:title|time); the alias lets the resume pre-filter match it against
+    the row that was checkpointed under id:<sid>.
+    """
+    return list(dict.fromkeys([resume_key(url, title, tm), resume_key("", title, tm)]))
+
+
+# ---------- Events -> subsessions pipeline ----------
+class SubsessionPipe:
+    """Streams session-page events onto a WorkQueue as soon as they are kept.
+
+    `workers` follower processes of whova.subsessions are started
+    up front, so subsession fetching overlaps with agenda extraction; with 0 the
+    followers are expected to be started separately on the same queue path.
+    Followers split one rate budget (and the proxy list) via --peers, like shards.
+    """
+
+    def __init__(self, path: Path, workers: int, subs_out: str, extra_args: str = "", headful: bool = False):
+        self.path = path
+        self.queue = WorkQueue(path)
+        self.pos = sum(self.queue.counts().values())
+        self.pushed = 0
+        cmd = ["--queue", str(path), "--follow", "--in", "", "--out", subs_out]
+        cmd += shlex.split(extra_args)
+        if headful:
+            cmd.append("--headful")
+        self.procs = []
+        try:
+            for i in range(workers):
+                self.procs.append(spawn_module("subsessions", cmd + ["--peers", str(workers), "--peer-index", str(i)]))
+        except BaseException:
+            self.close()
+            raise
+        print(f"[PIPE] queue={path} | followers={workers} -> {subs_out}", flush=True)
+
+    def push(self, events: Iterable[Event]) -> int:
+        items = []
+        for e in events:
+            if whova_session_id(e.url):
+                items.append((resume_key(e.url), self.pos, dict(zip(EVENT_HEADER, event_row(e)))))
+                self.pos += 1
+        if items:
+            self.pushed += self.queue.enqueue_many(items)
+        return len(items)
+
+    def close(self):
+        self.queue.seal()
+        codes = [pr.wait() for pr in self.procs]
+        print(f"[PIPE] sealed | pushed={self.pushed} | {self.queue.counts()} | follower exit codes={codes}", flush=True)
+        self.queue.close()
+
+
+# ---------- Main ----------
+def main(argv: Optional[List[str]] = None, shared_pool: Optional[BrowserPool] = None):
+    """argv defaults to sys.argv[1:]; shared_pool lets whova.multi reuse one browser across runs."""
+    argv = with_profile(argv, "events")
+    ap = argparse.ArgumentParser()
+    add_profile_args(ap)
+    ap.add_argument("--url", required=True)
+    ap.add_argument("--out", default="kdd2025_events.csv")
+    ap.add_argument("--timeout", type=int, default=180)
+    ap.add_argument("--max-rps", type=float, default=0.6)
+    ap.add_argument("--jitter-ms", nargs=2, type=int, default=[200, 800])
+    ap.add_argument("--burst", type=int, default=1, help="token-bucket capacity (requests that may go out back to back)")
+    ap.add_argument("--adaptive-rate", action="store_true", help="AIMD: raise the rate additively while healthy, halve it on timeouts/429/empty results (bounded to 1/4..1x of --max-rps / --host-rps, never above them)")
+    ap.add_argument("--latency-target", type=float, default=5.0, help="with --adaptive-rate, do not speed up when page loads are slower than this (s)")
+    ap.add_argument("--host-rps", nargs="*", default=[], help="per-host budgets, e.g. whova.com=0.4 kdd.org=1 (others use --max-rps)")
+    ap.add_argument("--rotate-every", type=int, default=60, help="recreate browser context & rotate UA/proxy every N items")
+    ap.add_argument("--checkpoint-every", type=int, default=50)
+    ap.add_argument("--ua-list", default="")
+    ap.add_argument("--proxy-list", default="")
+    ap.add_argument("--headful", action="store_true")
+    ap.add_argument("--debug", action="store_true")
+    ap.add_argument("--extract-mode", choices=["batch", "html", "card"], default="batch", help="batch: one frame.evaluate for all cards; html: parse one fr.content() snapshot offline; per-card locators only for incomplete ones")
+    ap.add_argument("--capture", choices=["dom", "api"], default="dom", help="api: build events from captured Whova JSON responses; DOM pass only when the capture comes up short")
+    ap.add_argument("--engine", choices=["sync", "async"], default="sync", help="async: run the playwright.async_api core (whova.aio) under asyncio.run")
+    ap.add_argument("--ready", choices=["observer", "watchdog"], default="observer", help="observer: MutationObserver + wait_for_function until the session count settles; watchdog: legacy innerText polling")
+    ap.add_argument("--frame-cache", default="whova_frame_cache.json", help="JSON cache of the resolved Whova embed URL per conference URL; '' to disable")
+    ap.add_argument("--block-resources", default=DEFAULT_BLOCK_RESOURCES, help="comma-separated Playwright resource types to abort (e.g. image,font,media,stylesheet); '' to disable")
+    ap.add_argument("--block-domains", default=DEFAULT_BLOCK_DOMAINS, help="comma-separated tracker domains to abort; '' to disable")
+    ap.add_argument("--pipe-queue", default="", help="stream session-page events onto this subsession work queue (SQLite) while extracting")
+    ap.add_argument("--pipe-workers", type=int, default=1, help="with --pipe-queue, subsession follower processes to start (0: start them yourself with --queue ... --follow)")
+    ap.add_argument("--pipe-out", default="", help="with --pipe-queue, subsession CSV written by the followers (default: derived from --out, *_events.csv -> *_subsessions.csv)")
+    ap.add_argument("--pipe-args", default="", help="extra flags passed to the subsession followers, e.g. '--max-rps 0.3 --lazy scroll'")
+    ap.add_argument("--title-selectors", nargs="+", default=None, help="override the title selector fallbacks (tried in order)")
+    ap.add_argument("--location-selector", default=None, help="override the session location selector")
+    ap.add_argument("--chip-selector", default=None, help="override the tag/track chip selector")
+    add_cache_args(ap)
+    add_har_args(ap)
+    ap.add_argument("--refresh", action="store_true", help="incremental refresh: walk every card, re-extract only those whose content fingerprint changed, and append added/removed/modified rows to <out>.changes.csv")
+    ap.add_argument("--max-drop", type=float, default=0.2, help="with --refresh, keep the published CSV when the card count falls by more than this fraction (1 to accept any drop)")
+    args = ap.parse_args(argv)
+    if args.offline or (args.har and args.har_mode == "replay"):
+        # nothing goes to the network, so pacing only slows the re-parse down
+        args.max_rps, args.jitter_ms, args.host_rps, args.adaptive_rate = 1000.0, [0, 0], [], False
+
+    sel = Selectors.from_args(args.title_selectors, args.location_selector, args.chip_selector)
+
+    out_path = Path(args.out)
+    if not args.pipe_out:
+        stem = out_path.stem[: -len("_events")] if out_path.stem.endswith("_events") else out_path.stem
+        args.pipe_out = str(out_path.with_name(f"{stem}_subsessions.csv"))
+    # a refresh is a full pass with its own (resumable) log, diffed against the published CSV at the end
+    ck_path = out_path.with_suffix(".refresh.partial.csv" if args.refresh else ".partial.csv")
+    if args.refresh and args.engine == "async":
+        ap.error("--refresh needs the sync engine")
+    if args.capture == "api" and args.engine == "async":
+        ap.error("--capture api needs the sync engine")
+    if args.extract_mode != "batch" and args.engine == "async":
+        ap.error(f"--extract-mode {args.extract_mode} needs the sync engine (async always extracts in batch)")
+
+    uas = load_lines(args.ua_list) or DEFAULT_UAS
+    proxies = load_lines(args.proxy_list)
+    ua_idx = prx_idx = 0
+
+    rate = RateLimiter(args.max_rps, tuple(args.jitter_ms), burst=args.burst, host_rps=parse_host_rps(args.host_rps), adaptive=args.adaptive_rate, latency_target=args.latency_target)
+    backoff = Backoff(base=2, factor=2, cap=90)
+    blocker = ResourceBlocker.from_args(args.block_resources, args.block_domains)
+    frame_cache = FrameCache(Path(args.frame_cache)) if args.frame_cache else None
+    cache = ResponseCache.from_args(args)
+    har = HarArchive.from_args(args)
+
+    # resume support: keys live in a SQLite index next to the output, so startup
+    # does not scan the partial log (which is append-only) unless the two disagree
+    ck = CheckpointWriter(ck_path, EVENT_HEADER)
+    seen_keys = ResumeIndex(out_path.with_suffix(".refresh.resume.sqlite" if args.refresh else ".resume.sqlite"))
+    if seen_keys.sync(ck, lambda rows: (k for r in rows for k in event_index_keys(r.get("url", ""), r.get("title", ""), r.get("time", "")))):
+        print("[LOG] resume index rebuilt from the partial log", flush=True)
+    print(f"[LOG] resume index: {len(seen_keys)} events done", flush=True)
+
+    pipe = SubsessionPipe(Path(args.pipe_queue), args.pipe_workers, args.pipe_out, args.pipe_args, args.headful) if args.pipe_queue else None
+    try:
+        if pipe and ck.start_offset > 0:
+            # events kept by an earlier run are skipped below, so hand them over now
+            pipe.push(Event(title=r.get("title", ""), time=r.get("time", ""), location=r.get("location", ""), tags=[t for t in r.get("tags", "").split(";") if t], url=r.get("url", "")) for r in ck.prior_rows())
+
+        total_collected: List[Event] = []
+
+        def keep(ev: Event):
+            key = event_key(ev)
+            if key not in seen_keys:
+                total_collected.append(ev)
+                for k in event_index_keys(ev.url, ev.title, ev.time):
+                    seen_keys.add(k)
+                ck.append([event_row(ev)])
+                if pipe:
+                    pipe.push([ev])
+
+        def checkpoint():
+            ck.checkpoint()
+            seen_keys.commit(ck.size)
+            print(f"[CKPT] synced -> {ck_path.name} (+{ck.rows} rows this run)", flush=True)
+
+        if args.engine == "async":
+            import asyncio
+            from . import aio
+
+            try:
+                arate = aio.AsyncRateLimiter(args.max_rps, tuple(args.jitter_ms), burst=args.burst, host_rps=parse_host_rps(args.host_rps), adaptive=args.adaptive_rate, latency_target=args.latency_target)
+                asyncio.run(
+                    aio.scrape_events(
+                        args.url,
+                        rate=arate,
+                        keep=keep,
+                        seen_keys=seen_keys,
+                        checkpoint=checkpoint,
+                        checkpoint_every=args.checkpoint_every,
+                        timeout_s=args.timeout,
+                        headless=not args.headful,
+                        uas=uas,
+                        proxies=proxies,
+                        rotate_every=args.rotate_every,
+                        ready=args.ready,
+                        frame_cache=frame_cache,
+                        blocker=blocker,
+                        selectors=sel,
+                        cache=cache,
+                        har=har,
+                    )
+                )
+                if ck.finalize(out_path):
+                    print(f"[OK] Saved {len(total_collected)} new events ({len(seen_keys)} total) -> {out_path}", flush=True)
+            finally:
+                seen_keys.close(ck.size)
+                if cache:
+                    print(f"[CACHE] {cache.summary()}", flush=True)
+                    cache.close()
+            return
+
+        def publish(note: str = ""):
+            """Write the output; in refresh mode only when something changed, logging the diff."""
+            if not args.refresh:
+                if ck.finalize(out_path):
+                    print(f"[OK] Saved {len(total_collected)} new events ({len(seen_keys)} total{note}) -> {out_path}", flush=True)
+                return
+            ck.checkpoint()
+            cur = {resume_key(r[4], r[0], r[1]): r for r in read_csv_rows(ck_path, EVENT_HEADER)}
+            old = {resume_key(r[4], r[0], r[1]): r for r in read_csv_rows(out_path, EVENT_HEADER)}
+            if not cur or sharp_drop(len(old), len(cur), args.max_drop):
+                # a half-rendered agenda would otherwise publish as mass "removed" rows; the log stays for a rerun
+                print(f"[WARN] refresh saw {len(cur)} events vs {len(old)} published (--max-drop {args.max_drop}); keeping the published CSV", flush=True)
+                ck.close()
+                return
+            changes = diff_rows(old, cur, EVENT_HEADER)
+            n = Counter(c[0] for c in changes)
+            if changes:
+                append_changelog(out_path.with_suffix(".changes.csv"), EVENT_HEADER, changes)
+                ck.finalize(out_path)
+            else:
+                ck.close()
+            print(f"[REFRESH] added={n['added']} removed={n['removed']} modified={n['modified']} | unchanged={len(cur) - n['added'] - n['modified']}{note} -> {out_path}", flush=True)
+            refreshed.append(True)
+
+        refreshed: List[bool] = []
+        with contextlib.nullcontext() if shared_pool else sync_playwright() as p:
+            # card fingerprints only pay off when every card is walked again, i.e. on --refresh
+            prints = FingerprintStore(out_path.with_suffix(".fingerprints.sqlite")) if args.refresh else None
+            fp_seen = set()
+
+            def new_context():
+                nonlocal ua_idx, prx_idx
+                ua, ua_idx = next_round_robin(uas, ua_idx)
+                proxy = None
+                if proxies:
+                    proxy, prx_idx = next_round_robin(proxies, prx_idx)
+                print(f"[CTX] new context | UA={ua[:30]}... | proxy={proxy or 'none'}", flush=True)
+                context = pool.new_context(
+                    proxy,
+                    viewport={"width": random.choice([1366, 1440, 1600]), "height": random.choice([900, 1000, 1050])},
+                    user_agent=ua,
+                    extra_http_headers={"Accept-Language": random.choice(["en-US,en;q=0.9", "en-GB,en;q=0.9"])},
+                )
+                if cache:
+                    cache.install(context)
+                if har:
+                    har.install(context)
+                blocker.install(context)
+                page = context.new_page()
+                return context, page
+
+            pool = shared_pool or BrowserPool(p, headless=not args.headful)
+            context, page = new_context()
+            capture = WhovaCapture()
+            if args.capture == "api":
+                capture.attach(page)
+            try:
+                hit = frame_cache.get(args.url) if frame_cache else None
+                first_url = hit["embed_url"] if hit and hit["direct"] else args.url
+                print(f"[LOG] Open: {first_url} | frame cache={'hit' if hit else 'miss'}", flush=True)
+                t_req = time.time()
+                resp = page.goto(first_url, wait_until="domcontentloaded", timeout=60_000)
+                rate.feedback(first_url, not (resp is not None and resp.status == 429), time.time() - t_req, reason="429")
+                print(f"[TIME] first paint {first_paint_ms(page) or 0:.0f}ms", flush=True)
+                rate.wait(first_url)
+
+                fr, opened_direct, from_cache = resolve_whova_frame(page, hit, first_timeout_ms=30_000)
+                print(f"[LOG] Use frame: {fr.url or '(main)'} | opened_direct={opened_direct} | cached={from_cache}", flush=True)
+                # rotations reopen the Whova agenda itself instead of the conference page
+                embed_url = fr.url if "whova" in (fr.url or "") else ""
+                if frame_cache and embed_url and not from_cache:
+                    # agenda in the main frame (opened direct, or the URL is the embed itself): reopen it
+                    # directly next time instead of waiting for an iframe that never appears
+                    frame_cache.put(args.url, embed_url, opened_direct or fr == page.main_frame)
+
+                if args.ready == "observer":
+                    cnt, _ = wait_sessions_ready(fr, min_cnt=5, overall_ms=min(args.timeout * 1000, 90_000))
+                else:
+                    cnt = wait_sessions_with_watchdog(fr, page, min_cnt=5, overall_ms=min(args.timeout * 1000, 90_000), rate=rate)
+                print(f"[LOG] Final session count seen={cnt}", flush=True)
+                if cnt <= 0 and from_cache:
+                    frame_cache.drop(args.url)  # stale entry; next run rediscovers
+
+                if args.capture == "api":
+                    n_resp = capture.wait(page, overall_ms=min(args.timeout * 1000, 30_000))
+                    m = WHOVA_EVENT_TOKEN.search(fr.url or "")
+                    try:
+                        dom_cnt = fr.locator("div.session").count()
+                        sample = fr.locator("div.session div.time-col").first.inner_text(timeout=1000) if dom_cnt else ""
+                    except PWError:
+                        dom_cnt, sample = 0, ""
+                    # write times the way the DOM path would for this agenda (24h / am / AM)
+                    api_sessions = capture.sessions(m.group(1) if m else "", clock_style(sample))
+                    print(f"[LOG] api responses={n_resp} | sessions={len(api_sessions)} | dom cards={dom_cnt}", flush=True)
+                    # DOM is only a cross-check (counted once the agenda is ready): trust the
+                    # payload when it covers every rendered card
+                    if api_sessions and len(api_sessions) >= dom_cnt:
+                        for sd in api_sessions:
+                            keep(Event(title=sd["title"], time=sd["time"], location=sd["location"], tags=sd["tags"], url=sd["url"]))
+                        publish(", api")
+                        return
+                    print("[WARN] api capture incomplete; falling back to DOM extraction", flush=True)
+
+                if cnt <= 0:
+                    backoff.sleep("[no sessions visible]")
+
+                # iterate sessions
+                total = fr.locator("div.session").count()
+                print(f"[LOG] Iterate sessions total={total}", flush=True)
+
+                records: List[dict] = []
+                decoded: List[Tuple[Optional[Event], bool]] = []
+                if args.extract_mode == "batch":
+                    tb = time.time()
+                    records = extract_records_batch(fr, sel)
+                    print(f"[LOG] batch records={len(records)} in {time.time() - tb:.2f}s", flush=True)
+                elif args.extract_mode == "html":
+                    tb = time.time()
+                    try:
+                        cards = extract_events_html(fr.content(), args.url, sel)
+                        records, decoded = [c[0] for c in cards], [c[1:] for c in cards]
+                    except PWError as e:
+                        print(f"[WARN] snapshot failed: {e}", flush=True)
+                    print(f"[LOG] html records={len(records)} in {time.time() - tb:.2f}s", flush=True)
+
+                t0 = time.time()
+                live_calls = skipped = reused = 0
+                resuming = len(seen_keys) > 0 or args.refresh
+                for i in range(total):
+                    ev, complete = None, False
+                    rec = records[i] if i < len(records) else (extract_record_card(fr, i, sel) if resuming else None)
+                    # unchanged card content -> reuse the row extracted last time (no live fallback)
+                    fp = fingerprint(rec) if prints is not None and rec is not None else ""
+                    cached = prints.get(fp) if fp else None
+                    if fp:
+                        fp_seen.add(fp)
+                    if cached is not None:
+                        ev, complete = event_from_row(cached), True
+                        reused += 1
+                    elif rec is not None:
+                        ev, complete = decoded[i] if i < len(decoded) else event_from_record(rec, base_url=args.url)
+
+                    # resume pre-filter: the card's id/title+time is already in the checkpoint
+                    if not complete and ev is not None and event_key(ev) in seen_keys:
+                        skipped += 1
+                        complete = True  # nothing to re-extract; keep() below is a no-op
+
+                    if not complete:
+                        rate.wait(fr.url)
+                        live_calls += 1
+                        # rotate context periodically (be gentle)
+                        if args.rotate_every > 0 and live_calls > 1 and (live_calls - 1) % args.rotate_every == 0:
+                            tr = time.time()
+                            try:
+                                context.close()
+                            except Exception:
+                                pass
+                            context, page = new_context()
+                            if embed_url:
+                                page.goto(embed_url, wait_until="domcontentloaded", timeout=60_000)
+                                fr = page.main_frame
+                                rate.wait(embed_url)
+                            else:
+                                page.goto(args.url, wait_until="domcontentloaded", timeout=60_000)
+                                rate.wait(args.url)
+                                fr, opened_direct = get_whova_frame_or_open_direct(page, first_timeout_ms=15_000)
+                            # only render as far as the card we need next
+                            if args.ready == "observer":
+                                wait_sessions_ready(fr, min_cnt=min(total, i + 1), overall_ms=20_000)
+                            else:
+                                wait_sessions_with_watchdog(fr, page, min_cnt=min(total, i + 1), overall_ms=20_000, rate=rate)
+                            print(f"[TIME] rotation {time.time() - tr:.2f}s | direct={bool(embed_url)} | first paint {first_paint_ms(page) or 0:.0f}ms", flush=True)
+
+                        t_req = time.time()
+                        try:
+                            ev = extract_event_from_session(fr, i, base_url=args.url, sel=sel)
+                        except PWError as e:
+                            print(f"[WARN] extract failed at {i}: {e}", flush=True)
+                            rate.feedback(fr.url, False, reason="error")
+                            backoff.sleep()
+                            continue
+                        rate.feedback(fr.url, ev is not None, time.time() - t_req, reason="empty")
+
+                    if ev:
+                        keep(ev)
+                        if fp and cached is None:
+                            prints.put(fp, event_row(ev))
+
+                    # progress
+                    if (i + 1) % 10 == 0 or (i + 1) == total:
+                        elapsed = time.time() - t0
+                        per = elapsed / max(1, (i + 1))
+                        eta = per * (total - (i + 1))
+                        last = (total_collected[-1].title[:60] + "…") if total_collected else "-"
+                        print(f"[PROG] {i + 1}/{total} | kept={len(total_collected)} | live={live_calls} | skipped={skipped} | reused={reused} | {per:.2f}s/it | ETA~{eta:.1f}s | {rate.state()} | last='{last}'", flush=True)
+
+                    # checkpoint
+                    if args.checkpoint_every > 0 and (i + 1) % args.checkpoint_every == 0:
+                        checkpoint()
+
+                # write final (publishes the checkpoint log as-is)
+                publish()
+                if prints is not None and refreshed and fp_seen:
+                    print(f"[REFRESH] pruned {prints.prune(fp_seen)} stale fingerprints", flush=True)
+                if blocker.enabled:
+                    print(f"[NET] {blocker.summary()}", flush=True)
+
+                # debug dump
+                if args.debug:
+                    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    try:
+                        page.screenshot(path=str(Path("debug_out") / f"shot_{ts}.png"), full_page=True)
+                    except Exception:
+                        pass
+                    try:
+                        Path("debug_out").mkdir(exist_ok=True)
+                    except Exception:
+                        pass
+                    try:
+                        Path("debug_out", f"dump_{ts}.html").write_text(fr.content(), encoding="utf-8")
+                    except Exception:
+                        pass
+
+            finally:
+                ck.close()
+                seen_keys.close(ck.size)
+                if prints is not None:
+                    prints.close()
+                if refreshed:
+                    # a completed refresh starts from scratch next time
+                    for f in (ck_path, seen_keys.path):
+                        f.unlink(missing_ok=True)
+                try:
+                    context.close()
+                except Exception:
+                    pass
+                if shared_pool is None:
+                    pool.close()
+                print(f"[TIME] {pool.summary()}", flush=True)
+                print(f"[RATE] {rate.summary()}", flush=True)
+                if cache:
+                    print(f"[CACHE] {cache.summary()}", flush=True)
+                    cache.close()
+    finally:
+        # --follow followers poll until the queue is sealed, so seal it on every exit path
+        if pipe:
+            pipe.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Scrape several conferences (events, then subsessions) in one process.
+
+One Playwright instance and one BrowserPool are shared by every run, so a
+multi-year backfill pays browser startup once; the frame cache is keyed by
+conference URL and is shared as well. Per-stage flags can be passed through
+with --events-args / --subs-args.
+
+  cd scraper && python -m whova.multi --conf kdd2024 kdd2025 --subs-args "--http-first"
+"""
+import argparse
+import shlex
+import time
+from pathlib import Path
+
+from playwright.sync_api import sync_playwright
+
+from . import events
+from . import subsessions
+from .common import BrowserPool
+from .conferences import load_conferences
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--conf", nargs="+", default=None, help="profile names (default: all)")
+    ap.add_argument("--profiles", default="", help="JSON list of extra/overriding conference profiles")
+    ap.add_argument("--stage", choices=["events", "subsessions", "all"], default="all")
+    ap.add_argument("--events-args", default="", help="extra flags for the events stage, e.g. '--extract-mode html'")
+    ap.add_argument("--subs-args", default="", help="extra flags for the subsessions stage, e.g. '--http-first'")
+    ap.add_argument("--frame-cache", default="whova_frame_cache.json")
+    ap.add_argument("--headful", action="store_true")
+    ap.add_argument("--list", action="store_true", help="print the known profiles and exit")
+    args = ap.parse_args()
+
+    confs = load_conferences(Path(args.profiles) if args.profiles else None)
+    if args.list:
+        for c in confs.values():
+            print(f"{c.name:<10} {c.url}\n{'':<10} -> {c.events_csv}, {c.subsessions_csv}", flush=True)
+        return
+    names = args.conf or list(confs)
+    unknown = [n for n in names if n not in confs]
+    if unknown:
+        ap.error(f"unknown conference(s): {unknown}; known: {sorted(confs)}")
+
+    failed = []
+    with sync_playwright() as p:
+        pool = BrowserPool(p, headless=not args.headful)
+        try:
+            for name in names:
+                conf = confs[name]
+                conf.workdir.mkdir(parents=True, exist_ok=True)
+                t0 = time.time()
+                print(f"[CONF] {name} | {conf.url}", flush=True)
+                try:
+                    if args.stage in ("events", "all"):
+                        events.main(
+                            conf.events_argv() + ["--frame-cache", args.frame_cache] + shlex.split(args.events_args),
+                            shared_pool=pool,
+                        )
+                    if args.stage in ("subsessions", "all"):
+                        subsessions.main(conf.subsessions_argv() + shlex.split(args.subs_args), shared_pool=pool)
+                except SystemExit as e:
+                    # the stage CLIs exit on fatal input errors; keep going with the next conference
+                    print(f"[WARN] {name}: stage exited with {e.code}", flush=True)
+                    failed.append(name)
+                print(f"[CONF] {name} done in {time.time() - t0:.1f}s", flush=True)
+        finally:
+            pool.close()
+            print(f"[TIME] {pool.summary()}", flush=True)
+    if failed:
+        print(f"[WARN] failed conferences: {failed}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
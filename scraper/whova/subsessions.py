@@ -0,0 +1,798 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import argparse, contextlib, csv, hashlib, os, queue, re, socket, sys, threading, time, random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple, Dict, Set
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+from playwright.sync_api import sync_playwright, Error as PWError, TimeoutError as PWTimeout
+from .common import add_cache_args, spawn_module, add_har_args, append_changelog, clock_style, diff_rows, fingerprint, read_csv_rows, sharp_drop
+from .conferences import add_profile_args, with_profile
+from .common import DEFAULT_BLOCK_DOMAINS, DEFAULT_BLOCK_RESOURCES, Backoff, BrowserPool, CheckpointWriter, FingerprintStore, HarArchive, HttpFetcher, LeaseKeeper, RateLimiter, ResourceBlocker, ResponseCache, ResumeIndex, TierStats, WhovaCapture, WorkQueue, first_paint_ms, parse_host_rps, resume_key, whova_session_id
+
+@dataclass
+class SubEvent:
+    parent_title: str
+    parent_time: str
+    parent_location: str
+    parent_tags: str
+    parent_url: str
+    title: str
+    time: str
+    location: str
+    url: str
+
+def nrm(s:str)->str: return re.sub(r"\s+"," ", (s or "").strip())
+TIME_PAT12 = re.compile(r"(?i)\b\d{1,2}:\d{2}\s?(?:am|pm)\s?[-–—]\s?\d{1,2}:\d{2}\s?(?:am|pm)\b")
+WHOVA_SESSION = re.compile(r"https?://(?:www\.)?whova\.com/embedded/session/", re.I)
+
+# ---- CSV helpers ----
+def find_url_column(header: List[str]) -> Optional[str]:
+    lowers = [h.lower() for h in header]
+    for cand in ("url","link","href"):
+        if cand in lowers:
+            return header[lowers.index(cand)]
+    return None
+
+def read_parent_events(path: Path) -> Tuple[List[Dict[str,str]], Optional[str]]:
+    rows: List[Dict[str,str]] = []
+    with path.open(encoding="utf-8") as f:
+        r = csv.DictReader(f)
+        cols = r.fieldnames or []
+        url_col = find_url_column(cols)
+        for row in r:
+            rows.append(row)
+    return rows, url_col
+
+SUB_HEADER = [
+    "parent_title","parent_time","parent_location","parent_tags","parent_url",
+    "title","time","location","url"
+]
+
+def subevent_row(e: SubEvent) -> List[str]:
+    return [
+        e.parent_title, e.parent_time, e.parent_location, e.parent_tags, e.parent_url,
+        e.title, e.time, e.location, e.url
+    ]
+
+def save_csv(rows: List[SubEvent], out_path: Path):
+    """一時ファイルに書いてfsync後にos.replace（途中で落ちても公開済みCSVは壊れない）"""
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(SUB_HEADER)
+        for e in rows:
+            w.writerow(subevent_row(e))
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, out_path)
+
+
+# ---- Page helpers ----
+def wait_subsessions_ready(page, timeout_ms=35000):
+    start = time.time()
+    swings = 0
+    last_h = 0
+    while (time.time() - start) * 1000 < timeout_ms:
+        # 1) 代表セレクタ
+        if page.locator("a.session-sub-title").count() > 0:
+            return True
+        # 2) ゆるめ
+        if page.locator(".session-subs, .session-subs-list").count() > 0:
+            if page.locator(".session-subs-list a[href*='/embedded/session/']").count() > 0:
+                return True
+        # 3) テキストでの見え方
+        if page.get_by_text("Subsessions", exact=False).count() > 0 and page.locator("a[href*='/embedded/session/']").count() > 0:
+            return True
+
+        # 読み込み促進（上下にスイング）
+        try:
+            h = page.evaluate("document.body && document.body.scrollHeight || 0") or 0
+            if h and h != last_h:
+                for y in range(0, h, 1200):
+                    page.evaluate(f"window.scrollTo(0,{y})")
+                    page.wait_for_timeout(150)
+                swings = 0
+                last_h = h
+            else:
+                # 下端→上端を往復して再描画を促す
+                if swings % 2 == 0:
+                    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                else:
+                    page.evaluate("window.scrollTo(0, 0)")
+                swings += 1
+        except Exception:
+            pass
+        page.wait_for_timeout(350)
+    return False
+
+# IntersectionObserver-aware lazy-load driver: a sentinel appended after all content
+# tells when the page end is on screen. Until then it scrolls the newest subsession
+# into view (firing its lazy load) or one viewport on, and resolves only once the
+# count has been stable for settleMs with the end in view. Runs entirely in-page.
+SUBS_SEL = ".session-subs-list .session-sub, a.session-sub-title, .session-subs-list a[href*='/embedded/session/']"
+LAZY_LOAD_JS = """
+([sel, settleMs, timeoutMs]) => new Promise((resolve) => {
+  const t0 = performance.now();
+  let steps = 0, last = -1, lastChange = t0, atEnd = false;
+  const sentinel = document.createElement("div");
+  sentinel.style.cssText = "height:1px;width:1px;";
+  document.body.appendChild(sentinel);
+  const io = new IntersectionObserver((es) => { atEnd = es.some((e) => e.isIntersecting); });
+  io.observe(sentinel);
+  const done = (n) => { io.disconnect(); sentinel.remove(); resolve({ count: n, steps, ms: performance.now() - t0 }); };
+  const tick = () => {
+    const now = performance.now();
+    const items = document.querySelectorAll(sel);
+    const n = items.length;
+    if (n !== last) { last = n; lastChange = now; }
+    if (n > 0 && atEnd && now - lastChange >= settleMs) return done(n);
+    if (now - t0 >= timeoutMs) return done(n);
+    if (!atEnd) {
+      const tail = items[n - 1];
+      if (tail && tail.getBoundingClientRect().top > window.innerHeight) tail.scrollIntoView({ block: "end" });
+      else window.scrollBy(0, window.innerHeight);
+      steps++;
+    } else if (n === 0 && now - lastChange >= settleMs) {
+      // nothing rendered even at the end: back to the top so the next pass re-triggers loading
+      window.scrollTo(0, 0); lastChange = now; steps++;
+    }
+    setTimeout(tick, 100);
+  };
+  tick();
+})
+"""
+
+def wait_subsessions_lazy(page, timeout_ms=35000, settle_ms=600) -> dict:
+    """{'count', 'steps', 'ms'} once the subsession count is stable with the page end in view (count=0 on timeout)."""
+    try:
+        return page.evaluate(LAZY_LOAD_JS, [SUBS_SEL, settle_ms, timeout_ms])
+    except PWError:
+        return {"count": 0, "steps": 0, "ms": float(timeout_ms)}
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# lxml: CSSセレクタ相当のXPathを事前コンパイル
+XP_ITEMS = etree.XPath(f"//*[{_has_class('session-subs-list')}]//*[{_has_class('session-sub')}]")
+XP_SUB_TITLE = etree.XPath(f"//a[{_has_class('session-sub-title')}]")
+XP_ITEM_TITLE = etree.XPath(f"(.//a[{_has_class('session-sub-title')}])[1]")
+XP_ITEM_LINK = etree.XPath("(.//a[contains(@href, '/embedded/session/')])[1]")
+XP_ITEM_TIME = etree.XPath(f"(.//*[{_has_class('session-sub-time')} or {_has_class('sub-time')} or {_has_class('time')}])[1]")
+XP_ITEM_LOC = etree.XPath(f"(.//*[{_has_class('session-sub-location')} or {_has_class('sub-location')} or {_has_class('location')}])[1]")
+
+def _anchor_text(a) -> str:
+    """<a>直下の文字列のみ。ネストした<a>はブラウザ/lxmlでは外側を閉じるので、html.parserでも外側に含めない"""
+    return nrm("".join(s for s in a.find_all(string=True) if s.find_parent("a") is a))
+
+def _subs_bs4(html: str, base_url: str) -> List[Tuple[str,str,str,str]]:
+    soup = BeautifulSoup(html, "html.parser")
+    out: List[Tuple[str,str,str,str]] = []
+    items = soup.select(".session-subs-list .session-sub")
+    if not items:
+        # ゆるめのフォールバック
+        for a in soup.select("a.session-sub-title"):
+            items.append(a.parent or a)
+
+    for it in items:
+        a = it.select_one("a.session-sub-title") or it.select_one("a[href*='/embedded/session/']")
+        title = _anchor_text(a) if a else ""
+        url = urljoin(base_url, a["href"]) if a and a.has_attr("href") else ""
+        t_el = it.select_one(".session-sub-time, .sub-time, .time")
+        time_str = nrm(t_el.get_text()) if t_el else ""
+        m = TIME_PAT12.search(time_str);  time_str = m.group(0) if m else time_str
+        l_el = it.select_one(".session-sub-location, .sub-location, .location")
+        location = nrm(l_el.get_text()) if l_el else ""
+        if any([title, time_str, location, url]):
+            out.append((title, time_str, location, url))
+    return out
+
+def _subs_lxml(html: str, base_url: str) -> List[Tuple[str,str,str,str]]:
+    root = lxml_html.fromstring(html)
+    out: List[Tuple[str,str,str,str]] = []
+    items = XP_ITEMS(root)
+    if not items:
+        # ゆるめのフォールバック
+        for a in XP_SUB_TITLE(root):
+            p = a.getparent()
+            items.append(p if p is not None else a)
+
+    for it in items:
+        a = (XP_ITEM_TITLE(it) or XP_ITEM_LINK(it) or [None])[0]
+        title = nrm(a.text_content()) if a is not None else ""
+        href = a.get("href") if a is not None else None
+        url = urljoin(base_url, href) if href is not None else ""
+        t_el = (XP_ITEM_TIME(it) or [None])[0]
+        time_str = nrm(t_el.text_content()) if t_el is not None else ""
+        m = TIME_PAT12.search(time_str);  time_str = m.group(0) if m else time_str
+        l_el = (XP_ITEM_LOC(it) or [None])[0]
+        location = nrm(l_el.text_content()) if l_el is not None else ""
+        if any([title, time_str, location, url]):
+            out.append((title, time_str, location, url))
+    return out
+
+def extract_subsessions_html(html: str, base_url: str, parser: str = "lxml") -> List[Tuple[str,str,str,str]]:
+    out: Optional[List[Tuple[str,str,str,str]]] = None
+    if parser == "lxml":
+        try:
+            out = _subs_lxml(html, base_url)
+        except (etree.ParserError, ValueError):
+            out = None  # 壊れたHTML/空文字はhtml.parserに回す
+    if out is None:
+        out = _subs_bs4(html, base_url)
+
+    # 去重
+    uniq, seen = [], set()
+    for t,ti,lo,u in out:
+        key = (t.lower(), ti.lower(), lo.lower(), u.lower())
+        if key in seen: continue
+        seen.add(key); uniq.append((t,ti,lo,u))
+    return uniq
+
+# ---- Sharding ----
+def shard_of(url: str, pos: int, n: int, k: int, by: str = "hash") -> int:
+    """hash: WhovaセッションID（無ければURL）のハッシュ / range: targets内の位置で連続区間"""
+    if by == "range":
+        return pos * k // max(1, n)
+    key = whova_session_id(url) or url
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest(), 16) % k
+
+def shard_path(out_path: Path, i: int, k: int) -> Path:
+    return out_path.with_name(f"{out_path.stem}.shard{i}of{k}{out_path.suffix}")
+
+def shard_proxies(proxies: List[str], i: int, k: int) -> Tuple[List[str], int]:
+    """シャードiが使うプロキシと、同じプロキシを共有するシャード数（rps分割用）"""
+    if not proxies:
+        return [], k  # 直結は全シャードで1つの出口を共有
+    if len(proxies) >= k:
+        return proxies[i::k], 1
+    return [proxies[i % len(proxies)]], len(range(i % len(proxies), k, len(proxies)))
+
+def merge_shards(out_path: Path, k: int, targets: List[Dict[str,str]], url_col: str) -> int:
+    """各シャードの出力をtargets順に並べ、(parent_url, title, time)で去重して out_path へ"""
+    by_parent: Dict[str, List[Dict[str,str]]] = {}
+    for i in range(k):
+        sp = shard_path(out_path, i, k)
+        if not sp.exists():
+            print(f"[WARN] missing shard output: {sp}", flush=True); continue
+        with sp.open(encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                by_parent.setdefault(row.get("parent_url",""), []).append(row)
+    order = [nrm(t.get(url_col,"")) for t in targets]
+    order += [u for u in by_parent if u not in set(order)]
+    seen: Set[Tuple[str,str,str]] = set()
+    rows: List[List[str]] = []
+    for u in order:
+        for row in by_parent.pop(u, []):
+            key = (row.get("parent_url",""), row.get("title","").lower(), row.get("time","").lower())
+            if key in seen: continue
+            seen.add(key); rows.append([row.get(h,"") for h in SUB_HEADER])
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f); w.writerow(SUB_HEADER); w.writerows(rows)
+    tmp.replace(out_path)
+    return len(rows)
+
+# ---- Main ----
+def main(argv: Optional[List[str]] = None, shared_pool: Optional[BrowserPool] = None):
+    """argv defaults to sys.argv[1:]; shared_pool（単一ワーカー時のみ使用）は whova.multi から共有ブラウザを渡す用"""
+    argv = with_profile(argv, "subsessions")
+    ap = argparse.ArgumentParser()
+    add_profile_args(ap)
+    ap.add_argument("--in", dest="in_csv", default="kdd2025_events.csv")
+    ap.add_argument("--out", dest="out_csv", default="kdd2025_subsessions.csv")
+    ap.add_argument("--max-rps", type=float, default=0.4)
+    ap.add_argument("--jitter-ms", nargs=2, type=int, default=[400,1200])
+    ap.add_argument("--burst", type=int, default=1, help="トークンバケット容量（連続で出せるリクエスト数）")
+    ap.add_argument("--adaptive-rate", action="store_true", help="AIMD: 健全なら加算で増速、timeout/429/空結果で半減（--max-rps の1/4〜1倍。設定値を超えない）")
+    ap.add_argument("--latency-target", type=float, default=5.0, help="adaptive時、これより遅いページ読込では増速しない（秒）")
+    ap.add_argument("--host-rps", nargs="*", default=[], help="ホスト別予算 例: whova.com=0.4 kdd.org=1（他は --max-rps）")
+    ap.add_argument("--checkpoint-every", type=int, default=20)
+    ap.add_argument("--rotate-every", type=int, default=30)
+    ap.add_argument("--ua-list", default="")
+    ap.add_argument("--proxy-list", default="")
+    ap.add_argument("--headful", action="store_true")
+    ap.add_argument("--lazy", choices=["observer","scroll"], default="observer", help="observer: IntersectionObserver駆動で件数が安定したら終了 / scroll: 従来の全体スクロール")
+    ap.add_argument("--http-first", action="store_true", help="まず requests で取得・解析し、サブセッションが無い時だけブラウザで開く")
+    ap.add_argument("--capture", choices=["dom","api"], default="dom", help="api: Whova JSONレスポンスからサブセッションを構築（取れない時のみDOM）")
+    ap.add_argument("--engine", choices=["sync","async"], default="sync", help="async: playwright.async_api版（whova.aio）で1イベントループ上に並列ページ")
+    ap.add_argument("--concurrency", type=int, default=1, help="並列ページ数（--max-rps は全ワーカー共通の予算）")
+    ap.add_argument("--parser", choices=["lxml","html.parser"], default="lxml", help="HTMLパーサ（lxmlはパースエラー時のみhtml.parserにフォールバック。ネストした<a>はどちらもブラウザ同様に外側を閉じて扱う）")
+    ap.add_argument("--block-resources", default=DEFAULT_BLOCK_RESOURCES, help="中断するリソース種別（例: image,font,media,stylesheet）。''で無効")
+    ap.add_argument("--block-domains", default=DEFAULT_BLOCK_DOMAINS, help="中断するトラッカードメイン。''で無効")
+    ap.add_argument("--shards", type=int, default=1, help="K個のOSプロセスに分割（各自ブラウザ/プロキシ/partialを持つ）")
+    ap.add_argument("--shard-index", type=int, default=None, help="（内部用）このプロセスが担当するシャード番号")
+    ap.add_argument("--shard-by", choices=["hash","range"], default="hash")
+    ap.add_argument("--merge-only", action="store_true", help="シャード出力のマージだけ行う")
+    ap.add_argument("--list-targets", action="store_true", help="対象の親URL一覧を表示して終了")
+    ap.add_argument("--queue", default="", help="共有ワークキュー(SQLite)。同じパスを指定した複数プロセスがlease/ackで親URLを分担")
+    ap.add_argument("--lease-ttl", type=float, default=120.0, help="lease期限（秒）。heartbeatが途絶えたタスクは期限後に再配布")
+    ap.add_argument("--max-attempts", type=int, default=3, help="1タスクの最大試行回数（超えたらfailed）")
+    add_cache_args(ap)
+    add_har_args(ap)
+    ap.add_argument("--refresh", action="store_true", help="差分更新: 全親を再取得し、本文ハッシュが前回と同じページは解析を省いて前回の結果を再利用（<out>.fingerprints.sqlite）。前回出力との差分を <out>.changes.csv に追記（取得に失敗した親は前回分を保持）")
+    ap.add_argument("--max-drop", type=float, default=0.2, help="--refresh 用: 行数が公開済みCSVよりこの割合を超えて減ったら上書きしない（1で無制限）")
+    ap.add_argument("--follow", action="store_true", help="--queue 用: キューが空でも生産者（イベント側 --pipe-queue）がsealするまで待ち続ける")
+    ap.add_argument("--peers", type=int, default=1, help="--queue 用: 同じキューを分担するプロセス数。シャードと同様にプロキシとrps・ホスト別rps・burstを分ける")
+    ap.add_argument("--peer-index", type=int, default=0, help="--peers 内でのこのプロセスの番号（0始まり）")
+    args = ap.parse_args(argv)
+    if args.offline or (args.har and args.har_mode == "replay"):
+        # キャッシュ/HARのみで再解析: レート制御は不要
+        args.max_rps, args.jitter_ms, args.host_rps, args.adaptive_rate = 1000.0, [0, 0], [], False
+    if args.har and args.http_first:
+        print("[WARN] --har はブラウザのみ記録/再生するため --http-first を無効化", flush=True)
+        args.http_first = False
+
+    in_path = Path(args.in_csv)
+    out_path = Path(args.out_csv)
+    ck_path = out_path.with_suffix(".refresh.partial.csv" if args.refresh else ".partial.csv")
+    if args.refresh and (args.queue or args.shards > 1):
+        ap.error("--refresh は --queue / --shards と併用不可")
+    if args.engine == "async":
+        # asyncコア（whova.aio）はブラウザ取得・DOM解析・observer待機のみ実装
+        bad = [f for f, on in (("--http-first", args.http_first), ("--capture api", args.capture == "api"), ("--lazy scroll", args.lazy == "scroll")) if on]
+        if bad: ap.error(f"{', '.join(bad)} は sync エンジンのみ対応")
+
+    if args.follow and not args.queue:
+        print("[FATAL] --follow は --queue と併用", flush=True); sys.exit(1)
+    if args.follow and (not args.in_csv or not in_path.exists()):
+        # パイプライン: 親イベントはイベント側スクレイパがキューへ流し込む
+        parents, url_col = [], "url"
+    elif not in_path.exists():
+        print(f"[FATAL] input CSV not found: {in_path}", flush=True); sys.exit(1)
+    else:
+        parents, url_col = read_parent_events(in_path)
+    if not url_col:
+        print(f"[FATAL] URL column not found in CSV headers. headers={list(parents[0].keys()) if parents else []}", flush=True); sys.exit(1)
+
+    # 対象抽出
+    targets = []
+    for p in parents:
+        u = nrm(p.get(url_col,""))
+        if WHOVA_SESSION.search(u):
+            targets.append(p)
+
+    print(f"[LOG] rows_in={len(parents)} | session_pages={len(targets)} | url_col='{url_col}'", flush=True)
+
+    # 0件なら理由説明
+    if len(targets) == 0 and not args.follow:
+        sample_urls = [nrm(p.get(url_col,"")) for p in parents[:10]]
+        print("[HINT] No 'embedded/session' URLs found.", flush=True)
+        print("       Sample URLs from CSV:", *sample_urls, sep="\n       ")
+        print("       → 親CSVのURLが 'embedded/event/...' になっていないか確認してください。", flush=True)
+        return
+
+    if args.list_targets:
+        print("[TARGETS] first 20:", flush=True)
+        for i, p in enumerate(targets[:20]):
+            print(f"  {i+1:>2}: {nrm(p.get(url_col,''))}", flush=True)
+        return
+
+    # シャード: 親プロセスはK個の子を起動してマージするだけ
+    if args.shards > 1 and args.shard_index is None:
+        if not args.merge_only:
+            procs = []
+            for i in range(args.shards):
+                print(f"[SHARD] start {i+1}/{args.shards} -> {shard_path(out_path, i, args.shards).name}", flush=True)
+                procs.append(spawn_module("subsessions", [*argv, "--shard-index", str(i), "--out", str(shard_path(out_path, i, args.shards))]))
+            codes = [pr.wait() for pr in procs]
+            if any(codes):
+                print(f"[WARN] shard exit codes={codes}; merging what exists (rerun resumes failed shards)", flush=True)
+        n = merge_shards(out_path, args.shards, targets, url_col)
+        print(f"[OK] Merged {args.shards} shards: {n} subsessions -> {out_path}", flush=True)
+        return
+    if args.shard_index is not None:
+        n_all = len(targets)
+        targets = [t for pos, t in enumerate(targets) if shard_of(nrm(t.get(url_col,"")), pos, n_all, args.shards, args.shard_by) == args.shard_index]
+        print(f"[SHARD] {args.shard_index+1}/{args.shards} ({args.shard_by}) | session_pages={len(targets)}/{n_all}", flush=True)
+
+    # 差分更新: 親の行が同じでもサブセッションページは変わり得るので全親を取り直し、解析結果の指紋で比較
+    all_targets = targets
+    prev: Dict[str, List[List[str]]] = {}
+    if args.refresh:
+        for r in read_csv_rows(out_path, SUB_HEADER):
+            prev.setdefault(r[4], []).append(r)
+        print(f"[REFRESH] parents to fetch={len(targets)} | published={len(prev)} | gone={len(set(prev) - {nrm(t.get(url_col,'')) for t in all_targets})}", flush=True)
+
+    wq: Optional[WorkQueue] = None
+    if args.queue:
+        if args.engine == "async" or args.shards > 1:
+            print("[FATAL] --queue は sync エンジン・シャードなしで使用（複数プロセスは同じ --queue で起動）", flush=True); sys.exit(1)
+        # キュー自体が進捗台帳: 結果はackと同じトランザクションで保存（partial/索引は使わない）
+        wq = WorkQueue(Path(args.queue), max_attempts=args.max_attempts)
+        added = wq.enqueue_many((resume_key(nrm(t.get(url_col,""))), pos, t) for pos, t in enumerate(targets))
+        print(f"[QUEUE] {args.queue} | +{added} tasks | {wq.counts()}", flush=True)
+        ck = index = None
+    else:
+        # partialは追記専用ログ（開く時に途中で切れた行を修復）
+        ck = CheckpointWriter(ck_path, SUB_HEADER)
+
+        # 既処理の親はWhovaセッションIDで索引（ログと食い違う時だけpartialから再構築）
+        index = ResumeIndex(out_path.with_suffix(".refresh.resume.sqlite" if args.refresh else ".resume.sqlite"))
+        if index.sync(ck, lambda rows: {resume_key(nrm(r.get("parent_url",""))) for r in rows if nrm(r.get("parent_url",""))}):
+            print("[LOG] resume index rebuilt from the partial log", flush=True)
+        print(f"[LOG] resume index: {len(index)} parents done", flush=True)
+
+    # UA/Proxy
+    def load_lines(p):
+        if not p: return []
+        path = Path(p)
+        if not path.exists(): return []
+        return [nrm(x) for x in path.read_text(encoding="utf-8").splitlines() if nrm(x)]
+    uas = load_lines(args.ua_list) or [
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0 Safari/537.36",
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    ]
+    proxies = load_lines(args.proxy_list)
+    peer = (args.shard_index, args.shards, "SHARD") if args.shard_index is not None else (args.peer_index, args.peers, "PEER") if args.peers > 1 else None
+    if peer:
+        # プロキシごとの予算を守る: 同じ出口を共有するシャード/フォロワー数で rps・ホスト別rps・burst を割る
+        proxies, sharing = shard_proxies(proxies, peer[0], peer[1])
+        args.max_rps /= sharing
+        args.host_rps = [f"{h}={v / sharing:g}" for h, v in parse_host_rps(args.host_rps).items()]
+        args.burst = max(1, args.burst // sharing)
+        print(f"[{peer[2]}] proxies={proxies or ['none']} | max-rps={args.max_rps:.3f} | host-rps={args.host_rps or '-'} | burst={args.burst}", flush=True)
+    ua_i = pr_i = 0
+    def next_rr(seq, idx):
+        if not seq: return None, idx
+        return seq[idx % len(seq)], idx + 1
+
+    rate = RateLimiter(args.max_rps, tuple(args.jitter_ms), burst=args.burst, host_rps=parse_host_rps(args.host_rps),
+                       adaptive=args.adaptive_rate, latency_target=args.latency_target)
+    blocker = ResourceBlocker.from_args(args.block_resources, args.block_domains)
+    cache = ResponseCache.from_args(args)
+    har = HarArchive.from_args(args)
+    tiers = TierStats()
+    lazy_stats: List[Tuple[float,int]] = []  # (待ち時間ms, スクロール回数)
+
+    # 未処理の親ページをキューへ（idxで元の順序を保持）
+    jobs: "queue.Queue[Tuple[int, Dict[str,str]]]" = queue.Queue()
+    if wq is None:
+        for idx, row in enumerate(targets):
+            if resume_key(nrm(row.get(url_col,""))) not in index:
+                jobs.put((idx, row))
+
+    done: Dict[int, List[SubEvent]] = {}
+    appended: List[SubEvent] = []  # ログへ書いた順
+    lock = threading.Lock()
+    processed_count = 0
+
+    # --refresh: 親ページ本文のハッシュ -> 前回の解析結果。本文が変わっていなければ解析しない
+    prints = FingerprintStore(out_path.with_suffix(".fingerprints.sqlite")) if args.refresh else None
+    fp_seen: Set[str] = set()
+    reparsed = [0, 0]  # [再利用, 解析]
+
+    def parse_subs(html: str, parent_url: str) -> List[Tuple[str,str,str,str]]:
+        if not html: return []
+        if prints is None: return extract_subsessions_html(html, base_url=parent_url, parser=args.parser)
+        fp = fingerprint([parent_url, html])
+        cached = prints.get(fp)
+        with lock:
+            fp_seen.add(fp); reparsed[cached is None] += 1
+        if cached is not None: return [tuple(r) for r in cached]
+        subs = extract_subsessions_html(html, base_url=parent_url, parser=args.parser)
+        if subs: prints.put(fp, [list(s) for s in subs])  # 空結果は覚えない（次回も解析し直す）
+        return subs
+
+    def record(idx: int, rows: List[SubEvent]):
+        nonlocal processed_count
+        with lock:
+            done[idx] = rows
+            appended.extend(rows)
+            if ck is not None:
+                ck.append(subevent_row(e) for e in rows)
+                if rows:
+                    index.add(resume_key(rows[0].parent_url))
+            processed_count += 1
+            n = processed_count
+            if n % 5 == 0 or n == len(targets):
+                print(f"[PROG] processed={n}/{len(targets)} | rows={len(appended) if ck is None else ck.rows} | {rate.state()}", flush=True)
+                if args.http_first:
+                    print(f"[TIER] {tiers.summary()}", flush=True)
+                if blocker.enabled:
+                    print(f"[NET] {blocker.summary()}", flush=True)
+            if ck is not None and args.checkpoint_every > 0 and n % args.checkpoint_every == 0:
+                ck.checkpoint()
+                index.commit(ck.size)  # ログのfsync後に索引を確定（ログサイズも記録）
+                print(f"[CKPT] -> {ck_path.name} (+{ck.rows} rows)", flush=True)
+
+    def new_context(pool):
+        nonlocal ua_i, pr_i
+        with lock:
+            ua, ua_i = next_rr(uas, ua_i)
+            pr, pr_i = next_rr(proxies, pr_i)
+        print(f"[CTX] new | UA={ua[:30]}... | proxy={pr or 'none'}", flush=True)
+        context = pool.new_context(
+            pr,
+            user_agent=ua,
+            viewport={"width": random.choice([1366,1440,1600]), "height": random.choice([900,1000,1050])},
+            extra_http_headers={"Accept-Language": random.choice(["en-US,en;q=0.9","en-GB,en;q=0.9"])},
+        )
+        if cache: cache.install(context)  # blockerより先に登録（後勝ちなのでblockerが先に判定）
+        if har: har.install(context)
+        blocker.install(context)
+        page = context.new_page()
+        return context, page
+
+    def worker(wid: int, shared: Optional[BrowserPool] = None):
+        backoff = Backoff()  # ワーカーごとのバックオフ
+        # sync APIはスレッドを跨げないので、ワーカーごとにPlaywrightを起動（呼び出し元スレッドなら共有プールを使う）
+        with contextlib.nullcontext() if shared else sync_playwright() as p:
+            pool = shared or BrowserPool(p, headless=not args.headful)
+            context, page = new_context(pool)
+            capture = WhovaCapture()
+            if args.capture == "api": capture.attach(page)
+            http = HttpFetcher(uas, proxies, rotate_every=args.rotate_every, cache=cache) if args.http_first else None
+            fresh_ctx = True
+            mine = 0
+            # キューモード: lease中のタスクはheartbeatで延長、処理結果はackで確定
+            wname = f"{socket.gethostname()}-{os.getpid()}-w{wid}"
+            keeper = LeaseKeeper(wq, wname, args.lease_ttl) if wq is not None else None
+            def take():
+                if wq is None:
+                    try: return jobs.get_nowait()
+                    except queue.Empty: return None
+                got = wq.lease(wname, args.lease_ttl)
+                while got is None and args.follow:
+                    # 生産者がsealし、未処理・lease中が無くなるまで待つ
+                    c = wq.counts()
+                    if wq.sealed() and not c.get("pending", 0) and not c.get("leased", 0):
+                        break
+                    time.sleep(1.0)
+                    got = wq.lease(wname, args.lease_ttl)
+                if got is None: return None
+                keeper.key = got[0]
+                return got[1], got[2]
+            def finish(idx, rows):
+                if wq is None:
+                    record(idx, rows); return
+                key, keeper.key = keeper.key, None
+                if not rows:
+                    wq.nack(key, wname)  # 空結果は再試行（max-attemptsまで）
+                elif wq.ack(key, wname, [subevent_row(e) for e in rows]):
+                    record(idx, rows)
+                else:
+                    print(f"[QUEUE] lease lost: {key} (他ワーカーが処理)", flush=True)
+            def give_up():
+                if keeper is not None and keeper.key:
+                    wq.nack(keeper.key, wname); keeper.key = None
+            try:
+                while True:
+                    job = take()
+                    if job is None:
+                        break
+                    idx, row = job
+                    parent_url = nrm(row.get(url_col,""))
+
+                    # ローテーション
+                    if args.rotate_every > 0 and mine > 0 and mine % args.rotate_every == 0:
+                        tr = time.time()
+                        try: context.close()
+                        except Exception: pass
+                        context, page = new_context(pool)
+                        if args.capture == "api": capture.attach(page)
+                        fresh_ctx = True
+                        print(f"[TIME] rotation {time.time()-tr:.2f}s", flush=True)
+
+                    parent_title = nrm(row.get("title","") or row.get("Title",""))
+                    parent_time  = nrm(row.get("time","")  or row.get("Time",""))
+                    parent_location = nrm(row.get("location","") or row.get("Location",""))
+                    parent_tags  = nrm(row.get("tags","")  or row.get("Tags",""))
+
+                    print(f"[OPEN] w{wid} {idx+1}/{len(targets)} {parent_title[:60]}…", flush=True)
+
+                    # 1段目: plain HTTP（サーバ描画済みならブラウザ不要）
+                    if http is not None:
+                        rate.wait(parent_url)
+                        t_req = time.time()
+                        status, body = http.get(parent_url)
+                        if status == 0 or status == 429 or status >= 500:
+                            rate.feedback(parent_url, False, reason=f"http {status or 'error'}")
+                        else:
+                            rate.feedback(parent_url, True, time.time() - t_req)
+                        subs = parse_subs(body, parent_url)
+                        with lock: tiers.record("http", bool(subs))
+                        if subs:
+                            finish(idx, [SubEvent(
+                                parent_title=parent_title, parent_time=parent_time,
+                                parent_location=parent_location, parent_tags=parent_tags,
+                                parent_url=parent_url,
+                                title=stitle, time=stime, location=sloc, url=surl
+                            ) for (stitle, stime, sloc, surl) in subs])
+                            continue
+
+                    capture.clear()
+                    rate.wait(parent_url)  # 1ページ1トークン
+                    t_req = time.time()
+                    try:
+                        resp = page.goto(parent_url, wait_until="domcontentloaded", timeout=60_000)
+                    except PWError as e:
+                        print(f"[WARN] goto failed: {e}", flush=True)
+                        rate.feedback(parent_url, False, reason="timeout" if isinstance(e, PWTimeout) else "error")
+                        give_up(); backoff.sleep("goto failed"); continue
+                    if resp is not None and resp.status == 429:
+                        rate.feedback(parent_url, False, reason="429")
+
+                    if fresh_ctx:
+                        print(f"[TIME] first paint {first_paint_ms(page) or 0:.0f}ms", flush=True)
+                        fresh_ctx = False
+
+                    subs = []
+                    if args.capture == "api":
+                        capture.wait(page, settle_ms=800, overall_ms=8_000)
+                        # 親行の時刻表記（24h/12h）に合わせて、DOM経路と同じ書式で出す
+                        subs = [(d["title"], d["time"], d["location"], d["url"]) for d in capture.subsessions_for(parent_url, clock_style(parent_time))]
+                    html = ""
+                    if not subs:
+                        # DOMは検証用フォールバック
+                        if args.lazy == "observer":
+                            lz = wait_subsessions_lazy(page, timeout_ms=35_000)
+                            with lock: lazy_stats.append((lz["ms"], lz["steps"]))
+                        else:
+                            wait_subsessions_ready(page, timeout_ms=35_000)
+
+                        # ここを「okでなくても一応パースしてみる」に変更
+                        try:
+                            html = page.content()
+                        except Exception:
+                            html = ""
+
+                        subs = parse_subs(html, parent_url)
+
+                    with lock: tiers.record("browser", bool(subs))
+                    if subs:
+                        rate.feedback(parent_url, True, time.time() - t_req)
+                    else:
+                        rate.feedback(parent_url, False, reason="empty")
+
+                    rows: List[SubEvent] = []
+                    if not subs:
+                        # うまく取れなかったらデバッグを残す（1件目だけでも）
+                        from datetime import datetime
+                        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+                        Path("debug_out").mkdir(exist_ok=True)
+                        try: page.screenshot(path=f"debug_out/subs_fail_{ts}_w{wid}.png", full_page=True)
+                        except Exception: pass
+                        try: Path(f"debug_out/subs_fail_{ts}_w{wid}.html").write_text(html or "", encoding="utf-8")
+                        except Exception: pass
+                        print("[WARN] subs not parsed; dumped debug_out/*.html", flush=True)
+                    else:
+                        for (stitle, stime, sloc, surl) in subs:
+                            rows.append(SubEvent(
+                                parent_title=parent_title, parent_time=parent_time,
+                                parent_location=parent_location, parent_tags=parent_tags,
+                                parent_url=parent_url,
+                                title=stitle, time=stime, location=sloc, url=surl
+                            ))
+                    mine += 1
+                    finish(idx, rows)
+            finally:
+                if keeper is not None:
+                    give_up(); keeper.stop()
+                try:
+                    context.close()
+                except Exception:
+                    pass
+                if shared is None: pool.close()
+                if http is not None: http.close()
+                print(f"[TIME] w{wid} {pool.summary()}", flush=True)
+
+    n_jobs = jobs.qsize() if wq is None else (args.concurrency if args.follow else len(targets))
+    n_workers = max(1, min(args.concurrency, n_jobs))
+    if n_jobs == 0:
+        print("[LOG] nothing to fetch", flush=True)
+    elif args.engine == "async":
+        import asyncio
+        from . import aio
+        pending = []
+        while not jobs.empty(): pending.append(jobs.get_nowait())
+        asyncio.run(aio.scrape_subsessions(
+            pending, url_col,
+            rate=aio.AsyncRateLimiter(args.max_rps, tuple(args.jitter_ms), burst=args.burst, host_rps=parse_host_rps(args.host_rps),
+                                                   adaptive=args.adaptive_rate, latency_target=args.latency_target),
+            concurrency=args.concurrency, headless=not args.headful,
+            uas=uas, proxies=proxies, rotate_every=args.rotate_every,
+            parser=args.parser, blocker=blocker, cache=cache, har=har, on_result=record,
+        ))
+    elif n_workers == 1:
+        worker(0, shared_pool)
+    else:
+        print(f"[LOG] concurrency={n_workers} (shared max-rps={args.max_rps})", flush=True)
+        threads = [threading.Thread(target=worker, args=(w,), name=f"subs-w{w}") for w in range(n_workers)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+    if wq is not None:
+        counts = wq.counts()
+        print(f"[QUEUE] {counts} | {rate.summary()}", flush=True)
+        if counts.get("pending", 0) or counts.get("leased", 0):
+            # 他のワーカーがまだ処理中: 最後に終わったワーカー（または再実行）が書き出す
+            print("[QUEUE] other workers still running; CSV is written by the last one", flush=True)
+            wq.close(); return
+        uniq = []
+        seen_q: Set[Tuple[str,str,str]] = set()
+        for r in wq.results():
+            e = SubEvent(*r)
+            key = (e.parent_url, e.title.lower(), e.time.lower())
+            if key in seen_q: continue
+            seen_q.add(key); uniq.append(e)
+        wq.close()
+        if not uniq and read_csv_rows(out_path, SUB_HEADER):
+            print(f"[WARN] empty result; keeping the existing {out_path}", flush=True); return
+        save_csv(uniq, out_path)
+        print(f"[OK] Saved {len(uniq)} subsessions from queue -> {out_path} (failed={counts.get('failed', 0)})", flush=True)
+        return
+
+    ck.checkpoint()
+    index.close(ck.size)
+
+    # partial分も新規分も親のtargets内の位置で並べる（再開・並列でも出力順は決定的。親内の順は安定ソートで保持）
+    results_prior = [SubEvent(**{k: row.get(k,"") for k in SUB_HEADER}) for row in ck.prior_rows()]
+    pos: Dict[str, int] = {}
+    for i, t in enumerate(targets):
+        pos.setdefault(nrm(t.get(url_col,"")), i)
+    results = sorted(results_prior + [e for i in sorted(done) for e in done[i]], key=lambda e: pos.get(e.parent_url, len(pos)))
+    print(f"[RATE] {rate.summary()}", flush=True)
+    if cache:
+        print(f"[CACHE] {cache.summary()}", flush=True)
+    if lazy_stats:
+        ms = sorted(x[0] for x in lazy_stats); st = sorted(x[1] for x in lazy_stats)
+        print(f"[LAZY] pages={len(ms)} | median wait={ms[len(ms)//2]/1000:.2f}s | median steps={st[len(st)//2]} | max steps={st[-1]}", flush=True)
+    if args.http_first:
+        print(f"[TIER] {tiers.summary()}", flush=True)
+
+    # 去重（parent_url + sub title + time）
+    uniq: List[SubEvent] = []
+    seen: Set[Tuple[str,str,str]] = set()
+    for e in results:
+        key = (e.parent_url, e.title.lower(), e.time.lower())
+        if key in seen: continue
+        seen.add(key); uniq.append(e)
+
+    if args.refresh:
+        # 取得分を親の順に並べ（取得失敗の親は前回分を保持）、公開済みCSVとの差分だけ記録
+        fetched: Dict[str, List[List[str]]] = {}
+        for e in uniq:
+            fetched.setdefault(e.parent_url, []).append(subevent_row(e))
+        subs_fp = lambda rows: fingerprint([r[5:] for r in rows])  # (title, time, location, url) のみ
+        same = sum(1 for u, rows in fetched.items() if u in prev and subs_fp(rows) == subs_fp(prev[u]))
+        kept = [u for t in all_targets for u in [nrm(t.get(url_col,""))] if u not in fetched and u in prev]
+        final = [r for t in all_targets for u in [nrm(t.get(url_col,""))] for r in fetched.get(u) or prev.get(u, [])]
+        print(f"[REFRESH] parents fetched={len(fetched)} | subsessions unchanged={same} | fetch failed, kept previous={len(kept)}", flush=True)
+        print(f"[REFRESH] page bodies unchanged (parse skipped)={reparsed[0]} | parsed={reparsed[1]}", flush=True)
+        if not results_prior and fp_seen:
+            # 中断なしの全件パスの時だけ、今回見なかった本文ハッシュを捨てる
+            print(f"[REFRESH] pruned {prints.prune(fp_seen)} stale fingerprints", flush=True)
+        prints.close()
+        published = [r for rows in prev.values() for r in rows]
+        if sharp_drop(len(published), len(final), args.max_drop):
+            print(f"[WARN] refresh saw {len(final)} subsessions vs {len(published)} published (--max-drop {args.max_drop}); keeping the published CSV", flush=True)
+            ck.close()
+            return
+        sub_key = lambda r: f"{r[4]}|{r[5].lower()}|{r[6].lower()}"
+        changes = diff_rows({sub_key(r): r for r in published}, {sub_key(r): r for r in final}, SUB_HEADER)
+        n = {c: sum(1 for x in changes if x[0] == c) for c in ("added","removed","modified")}
+        if changes:
+            append_changelog(out_path.with_suffix(".changes.csv"), SUB_HEADER, changes)
+            ck.finalize(out_path, final)
+        else:
+            ck.close()
+        for f in (ck_path, out_path.with_suffix(".refresh.resume.sqlite")):
+            f.unlink(missing_ok=True)
+        print(f"[REFRESH] added={n['added']} removed={n['removed']} modified={n['modified']} | rows={len(final)} -> {out_path}", flush=True)
+        return
+
+    # ログの並びがそのまま最終形なら書き直さずにコピー
+    if uniq == results_prior + appended:
+        saved = ck.finalize(out_path)
+    else:
+        saved = ck.finalize(out_path, (subevent_row(e) for e in uniq))
+    if saved:
+        print(f"[OK] Saved {len(uniq)} subsessions -> {out_path}", flush=True)
+
+if __name__ == "__main__":
+    main()
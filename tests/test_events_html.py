@@ -0,0 +1,64 @@
+"""extract_records_html / extract_events_html against the record shape of the in-page batch extractor."""
+import re
+
+from whova.events import CARD_RECORD_JS
+from whova.events import DEFAULT_SELECTORS
+from whova.events import Event
+from whova.events import extract_events_html
+from whova.events import extract_records_html
+
+BASE = "https://whova.com/embedded/event/avBTMdVt9LpKU8wGBhyS7P0tL-aSotzP6HuqmCh%40ZhY%3D/"
+SESSION = "https://whova.com/embedded/session/avBTMdVt9LpKU8wGBhyS7P0tL-aSotzP6HuqmCh%40ZhY%3D/3916551/"
+
+CARD = f"""
+<div class="session">
+  <div class="time-col"><div>10:00 AM - 12:00 PM</div></div>
+  <div class="content-col">
+    <div class="session-title-row-left"><span class="session-title">Graph<b>RAG</b> in <i>Practice</i></span></div>
+    <div class="session-location">Room <span>201</span></div>
+    <div class="session-tracks"><span>Research</span><span>LLM</span></div>
+    <a href="{SESSION}">view more detailed information</a>
+  </div>
+</div>
+"""
+SUBS_CARD = """
+<div class="session">
+  <div class="time-col">1:30 PM - 3:00 PM</div>
+  <div class="content-col">
+    <span class="session-title">Research Track <b>3</b></span>
+    <span class="session-subs">4 subsessions</span>
+  </div>
+</div>
+"""
+
+
+def test_record_keys_match_card_record_js():
+    js_keys = re.findall(r"^\s+(\w+):", CARD_RECORD_JS.split("return {", 1)[1], re.M)
+    (rec,) = extract_records_html(CARD)
+    assert list(rec) == js_keys
+
+
+def test_record_fields_match_inner_text():
+    (rec,) = extract_records_html(CARD)
+    # what innerText returns for the same card: inline markup is joined, not split
+    assert rec["titles"] == ["GraphRAG in Practice"] * 3 + [None] * (len(DEFAULT_SELECTORS.title) - 3)
+    assert rec["heading"] is None
+    assert rec["location"] == "Room 201"
+    assert rec["time_text"] == "10:00 AM - 12:00 PM"
+    assert rec["chips"] == ["Research", "LLM"]
+    assert rec["href"] == SESSION
+    assert rec["has_subs"] is False
+    # card/content texts stay line-split for the title/location fallbacks
+    lines = [ln.strip() for ln in rec["content_text"].splitlines() if ln.strip()]
+    assert lines == ["GraphRAG in Practice", "Room 201", "ResearchLLM", "view more detailed information"]
+    assert "10:00 AM - 12:00 PM" in rec["card_text"].splitlines()
+
+
+def test_events_html():
+    cards = extract_events_html(CARD + SUBS_CARD, BASE)
+    assert [(ev, complete) for _, ev, complete in cards] == [
+        (Event(title="GraphRAG in Practice", time="10:00 AM - 12:00 PM", location="Room 201", tags=["Research", "LLM"], url=SESSION), True),
+        # the session link only appears after clicking the subsessions chip
+        (Event(title="Research Track 3", time="1:30 PM - 3:00 PM", location="", tags=[], url=""), False),
+    ]
+    assert [rec["has_subs"] for rec, _, _ in cards] == [False, True]
@@ -0,0 +1,80 @@
+"""extract_subsessions_html on saved KDD pages and on malformed nesting, with both parsers."""
+import csv
+import html
+from pathlib import Path
+
+import pytest
+
+from whova.subsessions import extract_subsessions_html
+
+SCRAPER = Path(__file__).resolve().parent.parent / "scraper"
+PARSERS = ["lxml", "html.parser"]
+BASE = "https://whova.com/embedded/session/bMmjr7UCYdEHcXQvuqfVt0Si3cTgbY5AgOHyJZbjDyk%3D/4638720/?widget=primary"
+# KDD 2024: 24h times ("11:00 – 11:15") and a %40-escaped event token
+BASE_2024 = "https://whova.com/embedded/session/avBTMdVt9LpKU8wGBhyS7P0tL-aSotzP6HuqmCh%40ZhY%3D/3968741/?widget=primary"
+
+
+def saved_subsessions(parent_url: str, conf: str = "kdd2025"):
+    with (SCRAPER / conf / f"{conf}_subsessions.csv").open(encoding="utf-8") as f:
+        return [(r["title"], r["time"], r["location"], r["url"]) for r in csv.DictReader(f) if r["parent_url"] == parent_url]
+
+
+def session_page(subs) -> str:
+    """Whova session page markup for (title, time, location, url) rows."""
+    items = "".join(
+        f'<div class="session-sub"><a class="session-sub-title" href="{html.escape(u)}">{html.escape(t)}</a>'
+        f'<div class="session-sub-time">{html.escape(ti)}</div><div class="session-sub-location">{html.escape(lo)}</div></div>'
+        for t, ti, lo, u in subs
+    )
+    return f'<html><body><div class="session-subs-list">{items}</div></body></html>'
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_kdd2025_session_page(parser):
+    expected = saved_subsessions(BASE)
+    assert len(expected) == 6
+    assert extract_subsessions_html(session_page(expected), base_url=BASE, parser=parser) == expected
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_kdd2024_session_page(parser):
+    expected = saved_subsessions(BASE_2024, "kdd2024")
+    assert len(expected) == 8
+    assert all("%40" in u and " – " in ti for _, ti, _, u in expected)
+    # site-relative hrefs, as Whova renders them: the %40 must survive urljoin undecoded
+    relative = [(t, ti, lo, u.replace("https://whova.com", "")) for t, ti, lo, u in expected]
+    assert extract_subsessions_html(session_page(relative), base_url=BASE_2024, parser=parser) == expected
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_saved_failure_dump_has_no_subsessions(parser):
+    page = (SCRAPER / "kdd2025" / "debug_out" / "subs_fail_20250811_110737.html").read_text(encoding="utf-8")
+    assert extract_subsessions_html(page, base_url=BASE, parser=parser) == []
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_nested_anchor_closes_outer_title(parser):
+    page = (
+        '<div class="session-subs-list"><p><div class="session-sub">'
+        '<a class="session-sub-title" href="/embedded/session/a/1/">T1<a href="/x">in</a></a>'
+        '<span class="session-sub-time">Time 8:00 AM - 8:20 AM</span></div></div>'
+    )
+    assert extract_subsessions_html(page, base_url=BASE, parser=parser) == [("T1", "8:00 AM - 8:20 AM", "", "https://whova.com/embedded/session/a/1/")]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_unclosed_items_and_loose_titles(parser):
+    page = (
+        '<div class="session-subs-list"><div class="session-sub"><a class="session-sub-title" href="/embedded/session/a/1/">T1</a>'
+        '<div class="session-sub"><a class="session-sub-title" href="/embedded/session/a/2/">T2</a>'
+    )
+    got = extract_subsessions_html(page, base_url=BASE, parser=parser)
+    assert [t for t, *_ in got] == ["T1", "T2"]
+    # no .session-subs-list: titles are picked up loosely, duplicates dropped
+    loose = '<a class="session-sub-title" href="/embedded/session/a/3/">T3</a><a class="session-sub-title" href="/embedded/session/a/3/">T3</a>'
+    assert extract_subsessions_html(loose, base_url=BASE, parser=parser) == [("T3", "", "", "https://whova.com/embedded/session/a/3/")]
+
+
+@pytest.mark.parametrize("page", ["", "   ", "<html></html>"])
+def test_empty_pages(page):
+    assert extract_subsessions_html(page, base_url=BASE) == []
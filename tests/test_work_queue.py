@@ -0,0 +1,75 @@
+"""WorkQueue lease/ack/nack state transitions and LeaseKeeper heartbeats (pure SQLite)."""
+import time
+
+import pytest
+
+from whova.common import LeaseKeeper
+from whova.common import WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = WorkQueue(tmp_path / "queue.sqlite", max_attempts=2)
+    q.enqueue_many([("id:2", 1, {"url": "b"}), ("id:1", 0, {"url": "a"})])
+    yield q
+    q.close()
+
+
+def test_lease_in_position_order_and_ack(queue):
+    assert queue.lease("w1") == ("id:1", 0, {"url": "a"})
+    assert queue.lease("w2") == ("id:2", 1, {"url": "b"})
+    assert queue.lease("w3") is None
+    assert queue.ack("id:2", "w2", [["b1"]])
+    assert queue.ack("id:1", "w1", [["a1"], ["a2"]])
+    assert queue.counts() == {"done": 2}
+    assert queue.results() == [["a1"], ["a2"], ["b1"]]
+
+
+def test_expired_lease_is_requeued(queue):
+    key, _, _ = queue.lease("w1", ttl_s=-1)
+    assert queue.lease("w2") == (key, 0, {"url": "a"})
+
+
+def test_ack_after_lost_lease_is_rejected(queue):
+    key, _, _ = queue.lease("w1", ttl_s=-1)
+    queue.lease("w2")
+    assert not queue.ack(key, "w1", [["stale"]])
+    assert not queue.heartbeat(key, "w1")
+    assert queue.ack(key, "w2", [["fresh"]])
+    assert queue.results() == [["fresh"]]
+
+
+def test_nack_retries_then_fails(queue):
+    key, _, _ = queue.lease("w1")
+    queue.nack(key, "w1")
+    assert queue.counts() == {"pending": 2}
+    assert queue.lease("w1")[0] == key
+    queue.nack(key, "w1")  # second attempt of max_attempts=2
+    assert queue.counts() == {"failed": 1, "pending": 1}
+    assert queue.lease("w1")[0] == "id:2"
+
+
+def test_expired_lease_out_of_attempts_fails(queue):
+    for _ in range(2):
+        key, _, _ = queue.lease("w1", ttl_s=-1)
+        assert key == "id:1"
+    assert queue.lease("w2")[0] == "id:2"
+    assert queue.counts() == {"failed": 1, "leased": 1}
+
+
+def test_lease_keeper_extends_lease(queue):
+    key, _, _ = queue.lease("w1", ttl_s=0.3)
+    keeper = LeaseKeeper(queue, "w1", ttl_s=0.3)
+    keeper.key = key
+    try:
+        time.sleep(0.6)
+        assert queue.lease("w2")[0] == "id:2"  # id:1 is still held by w1
+    finally:
+        keeper.stop()
+    assert queue.ack(key, "w1", [["a1"]])
+
+
+def test_seal(queue):
+    assert not queue.sealed()
+    queue.seal()
+    assert queue.sealed()